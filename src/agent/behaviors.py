@@ -1,5 +1,7 @@
+import math
 import random
 from enum import Enum, auto
+import numpy as np
 import pygame
 
 class ControlMode(Enum):
@@ -9,17 +11,23 @@ class ControlMode(Enum):
     POTENTIAL_FIELD = auto()
 
 
+# (key, alternate key, dx, dy) for manual control: WASD or arrow keys.
+_MANUAL_KEY_DIRECTIONS = (
+    (pygame.K_w, pygame.K_UP, 0, -1),
+    (pygame.K_s, pygame.K_DOWN, 0, 1),
+    (pygame.K_a, pygame.K_LEFT, -1, 0),
+    (pygame.K_d, pygame.K_RIGHT, 1, 0),
+)
+
+
 def get_manual_move(robot, goal_pos, pedestrians, keys):
-    move = pygame.Vector2(0, 0)
-    if keys[pygame.K_w] or keys[pygame.K_UP]:
-        move.y -= 1
-    if keys[pygame.K_s] or keys[pygame.K_DOWN]:
-        move.y += 1
-    if keys[pygame.K_a] or keys[pygame.K_LEFT]:
-        move.x -= 1
-    if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
-        move.x += 1
-    return move
+    dx = 0
+    dy = 0
+    for key, alt_key, step_x, step_y in _MANUAL_KEY_DIRECTIONS:
+        if keys[key] or keys[alt_key]:
+            dx += step_x
+            dy += step_y
+    return pygame.Vector2(dx, dy)
 
 
 def get_naive_move(robot, goal_pos, pedestrians, keys):
@@ -37,27 +45,44 @@ def get_random_move(robot, goal_pos, pedestrians, keys):
 
 
 def get_potential_field_move(robot, goal_pos, pedestrians, keys):
+    """
+    Goal attraction plus inverse-square pedestrian repulsion.
+
+    ``pedestrians`` is a PedestrianSystem (or a selection of one); the
+    robot-pedestrian offsets come from its per-frame cache.
+    """
     ATTRACT_STRENGTH = 1.0
     REPEL_STRENGTH = 50.0
     REPEL_RADIUS = 60.0
+    REPEL_RADIUS_SQ = REPEL_RADIUS * REPEL_RADIUS
 
-    to_goal = pygame.Vector2(goal_pos.x - robot.x, goal_pos.y - robot.y)
-    if to_goal.length() > 0:
-        attract = to_goal.normalize() * ATTRACT_STRENGTH
-    else:
-        attract = pygame.Vector2(0, 0)
+    attract_x = 0.0
+    attract_y = 0.0
+    goal_dx = goal_pos.x - robot.x
+    goal_dy = goal_pos.y - robot.y
+    goal_dist_sq = goal_dx * goal_dx + goal_dy * goal_dy
+    if goal_dist_sq > 0:
+        attract_scale = ATTRACT_STRENGTH / math.sqrt(goal_dist_sq)
+        attract_x = goal_dx * attract_scale
+        attract_y = goal_dy * attract_scale
 
-    repel = pygame.Vector2(0, 0)
-    for ped in pedestrians:
-        to_robot = pygame.Vector2(robot.x - ped.x, robot.y - ped.y)
-        dist = to_robot.length()
-        if 0 < dist < REPEL_RADIUS:
-            strength = REPEL_STRENGTH / (dist * dist)
-            repel += to_robot.normalize() * strength
+    dx, dy, dist_sq = pedestrians.offsets_from(robot.x, robot.y)
+    in_range = (dist_sq > 0) & (dist_sq < REPEL_RADIUS_SQ)
+    dist_sq = dist_sq[in_range]
+    # strength / dist turns (dx, dy) into a unit vector scaled by strength.
+    scale = REPEL_STRENGTH / (dist_sq * np.sqrt(dist_sq))
 
-    return attract + repel
+    return pygame.Vector2(
+        attract_x + float((dx[in_range] * scale).sum()),
+        attract_y + float((dy[in_range] * scale).sum()),
+    )
 
 
+# Control policies, called once per frame as
+# fn(robot, goal_pos, pedestrians, keys) -> pygame.Vector2 direction.
+# ``pedestrians`` is the PedestrianSystem (or a PedestrianSelection of the
+# ray-visible ones), so policies can read its arrays directly; ``keys`` is
+# the pygame.key.get_pressed() state, or None outside manual mode.
 BEHAVIORS = {
     ControlMode.MANUAL: get_manual_move,
     ControlMode.NAIVE: get_naive_move,
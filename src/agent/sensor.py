@@ -54,7 +54,10 @@ class RaySensor:
                 end_x = robot_x + math.cos(angle) * dist
                 end_y = robot_y + math.sin(angle) * dist
                 for ped in pedestrians:
-                    if math.hypot(end_x - ped.x, end_y - ped.y) <= ped.radius + 2:
+                    dx = end_x - ped.x
+                    dy = end_y - ped.y
+                    reach = ped.radius + 2
+                    if dx * dx + dy * dy <= reach * reach:
                         ped_id = id(ped)
                         if ped_id not in visible_ids:
                             visible_ids.add(ped_id)
@@ -183,7 +186,10 @@ def draw_rays(surface, endpoints, alpha=80):
         HIT_WALL: (50, 50, 200),
     }
     
+    drawn = []
     for x1, y1, x2, y2, hit_type in endpoints:
         color = colors.get(hit_type, (100, 100, 100))
-        pygame.draw.line(surface, color, (int(x1), int(y1)), (int(x2), int(y2)), 1)
-        pygame.draw.circle(surface, color, (int(x2), int(y2)), 3)
+        drawn.append(pygame.draw.line(surface, color, (int(x1), int(y1)), (int(x2), int(y2)), 1))
+        drawn.append(pygame.draw.circle(surface, color, (int(x2), int(y2)), 3))
+    # Bounding Rect of all rays, for dirty-rect display updates.
+    return drawn[0].unionall(drawn[1:]) if drawn else pygame.Rect(0, 0, 0, 0)
@@ -4,6 +4,7 @@ import pygame
 
 from constants import HEIGHT, WIDTH, SIM_FPS
 from environment.robot import Robot
+from environment.pedestrian import PedestrianSystem
 from environment.pathfinding import NavGrid
 from environment.scenarios import (
     SCENARIO_CONFIG_DIR,
@@ -118,6 +119,7 @@ class CrowdNavEnv(gym.Env):
         self.nav_grid = None
         self.robot = None
         self.pedestrians = []
+        self.ped_system = None
         self.goal_pos = None
         self.current_step = 0
         self._prev_dist_to_goal = 0.0      # for progress-based shaping
@@ -139,6 +141,9 @@ class CrowdNavEnv(gym.Env):
 
         self.screen = None
         self.clock = None
+        # Background, obstacles and goal, drawn once per scenario.
+        self._static_layer = None
+        self._static_layer_scenario = None
 
     def reset(self, seed=None, options=None):
         if seed is not None:
@@ -154,6 +159,7 @@ class CrowdNavEnv(gym.Env):
             y=self.scenario.robot_start[1],
         )
         self.pedestrians = self._generate_pedestrians()
+        self.ped_system = PedestrianSystem(self.pedestrians)
         self._flow_pedestrian_ids = select_flow_pedestrians(
             self.pedestrians,
             self.scenario_id,
@@ -215,7 +221,9 @@ class CrowdNavEnv(gym.Env):
             old_x, old_y = self.robot.x, self.robot.y
             self._last_blocked_axes = self.robot.move_with_obstacles(
                 pygame.Vector2(float(self._last_move[0]), float(self._last_move[1])),
-                self.scenario.obstacles,
+                self.scenario.obstacle_grid.near(
+                    self.robot.x, self.robot.y, self.robot.radius + self.robot.speed + 2
+                ),
             )
             self._last_actual_move = np.array(
                 [self.robot.x - old_x, self.robot.y - old_y],
@@ -227,15 +235,14 @@ class CrowdNavEnv(gym.Env):
             self._last_blocked_axes = 0
             self._last_turn_penalty = 0.0
         
-        for ped in self.pedestrians:
-            pid = id(ped)
-            if self._ped_goal_dwell_frames.get(pid, 0) > 0:
-                # Hold briefly at destination before choosing the next activity.
-                ped.vx *= 0.5
-                ped.vy *= 0.5
-                continue
-            ped.update(self.pedestrians, self.scenario.obstacles, rng=self.rng)
+        self.ped_system.step(
+            self.scenario.obstacles,
+            rng=self.rng,
+            goal_dwell_frames=self._ped_goal_dwell_frames,
+            obstacle_grid=self.scenario.obstacle_grid,
+        )
         self._reassign_reached_goals()
+        self.ped_system.sync()
         
         dist_to_goal = np.hypot(
             self.robot.x - self.goal_pos[0],
@@ -295,7 +302,7 @@ class CrowdNavEnv(gym.Env):
 
     def _reassign_reached_goals(self):
         reassign_pedestrian_goals(
-            pedestrians=self.pedestrians,
+            pedestrians=self.ped_system,
             scenario=self.scenario,
             nav_grid=self.nav_grid,
             rng=self.rng,
@@ -306,6 +313,10 @@ class CrowdNavEnv(gym.Env):
             sim_fps=SIM_FPS,
         )
 
+    def _robot_pedestrian_distances(self):
+        """Robot-pedestrian distances for this step, computed once and shared by all reward terms."""
+        return self.ped_system.distances_from(self.robot.x, self.robot.y).tolist()
+
     def _get_observation(self):
         ray_obs = self.ray_sensor.cast_rays_flat(
             self.robot.x, self.robot.y,
@@ -431,8 +442,7 @@ class CrowdNavEnv(gym.Env):
                 ramp = min(1.0, overflow / max(1.0, float(self.no_progress_grace_steps)))
                 reward += self.no_progress_penalty * (1.0 + ramp)
         
-        for ped in self.pedestrians:
-            dist = np.hypot(self.robot.x - ped.x, self.robot.y - ped.y)
+        for ped, dist in zip(self.pedestrians, self._robot_pedestrian_distances()):
             overlap_dist = self.robot.radius + ped.radius
             
             if dist < overlap_dist:
@@ -569,8 +579,7 @@ class CrowdNavEnv(gym.Env):
         pedestrian_slowdown = 0.0
         blocking_pressure = 0.0
 
-        for ped in self.pedestrians:
-            dist = np.hypot(self.robot.x - ped.x, self.robot.y - ped.y)
+        for ped, dist in zip(self.pedestrians, self._robot_pedestrian_distances()):
             overlap_dist = self.robot.radius + ped.radius
             if overlap_dist <= dist < self.near_miss_radius:
                 near_misses += 1
@@ -601,8 +610,7 @@ class CrowdNavEnv(gym.Env):
     def _crowd_pressure_penalty(self):
         local_pressure = 0.0
         close_neighbors = 0
-        for ped in self.pedestrians:
-            dist = np.hypot(self.robot.x - ped.x, self.robot.y - ped.y)
+        for dist in self._robot_pedestrian_distances():
             if dist >= self.crowd_pressure_radius:
                 continue
             close_neighbors += 1
@@ -623,10 +631,9 @@ class CrowdNavEnv(gym.Env):
         pressure = 0.0
         forward_neighbors = 0
 
-        for ped in self.pedestrians:
+        for ped, dist in zip(self.pedestrians, self._robot_pedestrian_distances()):
             rel_x = ped.x - self.robot.x
             rel_y = ped.y - self.robot.y
-            dist = np.hypot(rel_x, rel_y)
             if dist < 1e-6 or dist >= self.crowd_approach_radius:
                 continue
 
@@ -705,8 +712,7 @@ class CrowdNavEnv(gym.Env):
     def _count_collisions(self):
         """Count how many pedestrians the robot is currently colliding with."""
         count = 0
-        for ped in self.pedestrians:
-            dist = np.hypot(self.robot.x - ped.x, self.robot.y - ped.y)
+        for ped, dist in zip(self.pedestrians, self._robot_pedestrian_distances()):
             if dist < self.robot.radius + ped.radius:
                 count += 1
         return count
@@ -736,26 +742,13 @@ class CrowdNavEnv(gym.Env):
                 self.close()
                 return None
         
-        # colors
-        bg_color = (245, 247, 240)
-        obstacle_color = (165, 170, 185)
-        goal_color = (245, 130, 40)
-        
-        self.screen.fill(bg_color)
-        
-        # draw obstacles
-        for obstacle in self.scenario.obstacles:
-            pygame.draw.rect(self.screen, obstacle_color, obstacle, border_radius=4)
-        
-        # draw goal
-        pygame.draw.circle(
-            self.screen, goal_color, 
-            (int(self.goal_pos[0]), int(self.goal_pos[1])), int(self.goal_visual_radius)
-        )
-        
+        if self._static_layer_scenario is not self.scenario:
+            self._static_layer = self._render_static_layer()
+            self._static_layer_scenario = self.scenario
+        self.screen.blit(self._static_layer, (0, 0))
+
         # draw pedestrians and robot
-        for ped in self.pedestrians:
-            ped.draw(self.screen)
+        self.ped_system.draw(self.screen)
         self.robot.draw(self.screen)
 
         endpoints = self.ray_sensor.get_ray_endpoints(
@@ -772,11 +765,35 @@ class CrowdNavEnv(gym.Env):
             np.array(pygame.surfarray.pixels3d(self.screen)), axes=(1, 0, 2)
         ) if self.render_mode == "rgb_array" else None
 
+    def _render_static_layer(self):
+        # colors
+        bg_color = (245, 247, 240)
+        obstacle_color = (165, 170, 185)
+        goal_color = (245, 130, 40)
+
+        layer = pygame.Surface((WIDTH, HEIGHT))
+        if pygame.display.get_surface() is not None:
+            layer = layer.convert()
+        layer.fill(bg_color)
+
+        # draw obstacles
+        for obstacle in self.scenario.obstacles:
+            pygame.draw.rect(layer, obstacle_color, obstacle, border_radius=4)
+
+        # draw goal
+        pygame.draw.circle(
+            layer, goal_color,
+            (int(self.goal_pos[0]), int(self.goal_pos[1])), int(self.goal_visual_radius)
+        )
+        return layer
+
     def close(self):
         if self.screen is not None:
             pygame.quit()
             self.screen = None
             self.clock = None
+            self._static_layer = None
+            self._static_layer_scenario = None
 
 
 # Quick test
@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 import math
 
 from constants import HEIGHT, WIDTH, SIM_SECONDS_PER_STEP
+from environment.obstacle_grid import hitbox_slide_collisions
 
 
 class PedestrianBehavior(ABC):
@@ -156,12 +157,14 @@ class FamilyGroupBehavior(PedestrianBehavior):
             f_align_x = (avg_vx - pedestrian.vx) * self.alignment_strength
             f_align_y = (avg_vy - pedestrian.vy) * self.alignment_strength
 
+            comfortable_dist = pedestrian.radius * 2.8
+            comfortable_dist_sq = comfortable_dist * comfortable_dist
             for member in group_members:
                 dx = pedestrian.x - member.x
                 dy = pedestrian.y - member.y
-                dist = math.hypot(dx, dy)
-                comfortable_dist = pedestrian.radius * 2.8
-                if 1e-6 < dist < comfortable_dist:
+                dist_sq = dx * dx + dy * dy
+                if 1e-12 < dist_sq < comfortable_dist_sq:
+                    dist = math.sqrt(dist_sq)
                     scale = (comfortable_dist - dist) / comfortable_dist
                     f_group_sep_x += dx / dist * scale * self.separation_strength
                     f_group_sep_y += dy / dist * scale * self.separation_strength
@@ -230,13 +233,14 @@ class ClumpBehavior(PedestrianBehavior):
         nearby_count = 0
         center_x, center_y = 0.0, 0.0
         
+        clump_radius_sq = self.clump_radius * self.clump_radius
         for other in others:
             if other is pedestrian:
                 continue
             dx = other.x - pedestrian.x
             dy = other.y - pedestrian.y
-            dist = math.hypot(dx, dy)
-            if dist < self.clump_radius and dist > 1e-6:
+            dist_sq = dx * dx + dy * dy
+            if 1e-12 < dist_sq < clump_radius_sq:
                 nearby_count += 1
                 center_x += other.x
                 center_y += other.y
@@ -258,8 +262,9 @@ class ClumpBehavior(PedestrianBehavior):
                 continue
             dx = pedestrian.x - other.x
             dy = pedestrian.y - other.y
-            dist = math.hypot(dx, dy)
-            if dist < self.clump_radius and dist > 1e-6:
+            dist_sq = dx * dx + dy * dy
+            if 1e-12 < dist_sq < clump_radius_sq:
+                dist = math.sqrt(dist_sq)
                 nx, ny = dx / dist, dy / dist
                 magnitude = pedestrian.ped_A * 0.2 * math.exp((pedestrian.radius + other.radius - dist) / pedestrian.ped_B)
                 f_sep_x += magnitude * nx
@@ -421,93 +426,107 @@ def _ttc_avoidance_force(pedestrian, others):
     return fx, fy
 
 
-def _apply_velocity_limits(pedestrian, prev_vx, prev_vy):
-    """Limit acceleration and turn rate to reduce oscillatory motion."""
+def _apply_velocity_limits(pedestrian, vx, vy, prev_vx, prev_vy, _hypot=math.hypot, _atan2=math.atan2):
+    """
+    Limit acceleration and turn rate to reduce oscillatory motion.
+
+    Works on local floats and returns the limited (vx, vy).
+    """
     # 1) Acceleration cap (limit delta-v magnitude per step).
-    dvx = pedestrian.vx - prev_vx
-    dvy = pedestrian.vy - prev_vy
-    dv_mag = math.hypot(dvx, dvy)
+    dvx = vx - prev_vx
+    dvy = vy - prev_vy
+    dv_mag = _hypot(dvx, dvy)
     max_dv = max(1e-6, pedestrian.max_delta_v_step())
     if dv_mag > max_dv:
         scale = max_dv / dv_mag
-        pedestrian.vx = prev_vx + dvx * scale
-        pedestrian.vy = prev_vy + dvy * scale
-
-    # 2) Turn-rate cap (limit heading change per step).
-    prev_speed = math.hypot(prev_vx, prev_vy)
-    curr_speed = math.hypot(pedestrian.vx, pedestrian.vy)
+        vx = prev_vx + dvx * scale
+        vy = prev_vy + dvy * scale
+
+    # 2) Turn-rate cap (limit heading change per step). The signed heading
+    # change comes straight from the cross/dot products, and the clamped
+    # velocity is the previous heading rotated by max_turn at current speed.
+    prev_speed = _hypot(prev_vx, prev_vy)
+    curr_speed = _hypot(vx, vy)
     max_turn = pedestrian.max_turn_step_radians()
     if prev_speed > 1e-6 and curr_speed > 1e-6 and max_turn > 1e-6:
-        prev_heading = math.atan2(prev_vy, prev_vx)
-        curr_heading = math.atan2(pedestrian.vy, pedestrian.vx)
-        delta = math.atan2(
-            math.sin(curr_heading - prev_heading),
-            math.cos(curr_heading - prev_heading),
-        )
+        delta = _atan2(prev_vx * vy - prev_vy * vx, prev_vx * vx + prev_vy * vy)
         if abs(delta) > max_turn:
-            clamped_heading = prev_heading + math.copysign(max_turn, delta)
-            pedestrian.vx = math.cos(clamped_heading) * curr_speed
-            pedestrian.vy = math.sin(clamped_heading) * curr_speed
-
-    # 3) Speed cap.
-    speed = math.hypot(pedestrian.vx, pedestrian.vy)
+            turn = math.copysign(max_turn, delta)
+            cos_t = math.cos(turn)
+            sin_t = math.sin(turn)
+            scale = curr_speed / prev_speed
+            vx = (prev_vx * cos_t - prev_vy * sin_t) * scale
+            vy = (prev_vx * sin_t + prev_vy * cos_t) * scale
+
+    # 3) Speed cap. Turning preserves speed, so curr_speed is still current.
     max_speed = pedestrian.max_speed_step()
-    if speed > max_speed:
-        pedestrian.vx = pedestrian.vx / speed * max_speed
-        pedestrian.vy = pedestrian.vy / speed * max_speed
+    if curr_speed > max_speed:
+        scale = max_speed / curr_speed
+        vx *= scale
+        vy *= scale
+    return vx, vy
 
 
 def _apply_movement(pedestrian, obstacles = None, rng = None):
-    """Apply velocity to position with collision handling and stuck recovery."""
+    """
+    Apply velocity to position with collision handling and stuck recovery.
+
+    Limits, smoothing, the collision probe and the screen clamp run on local
+    floats; the pedestrian's velocity and position are written back once.
+    """
     pid = id(pedestrian)
-    prev_vx, prev_vy = _velocity_history.get(pid, (pedestrian.vx, pedestrian.vy))
-    _apply_velocity_limits(pedestrian, prev_vx, prev_vy)
-    pedestrian.vx = (
-        pedestrian.vx * (1.0 - _VELOCITY_SMOOTHING)
-        + prev_vx * _VELOCITY_SMOOTHING
-    )
-    pedestrian.vy = (
-        pedestrian.vy * (1.0 - _VELOCITY_SMOOTHING)
-        + prev_vy * _VELOCITY_SMOOTHING
-    )
-
-    old_x, old_y = pedestrian.x, pedestrian.y
-    proposed_x = pedestrian.x + pedestrian.vx
-    proposed_y = pedestrian.y + pedestrian.vy
+    vx, vy = pedestrian.vx, pedestrian.vy
+    prev_vx, prev_vy = _velocity_history.get(pid, (vx, vy))
+    vx, vy = _apply_velocity_limits(pedestrian, vx, vy, prev_vx, prev_vy)
+    vx = vx * (1.0 - _VELOCITY_SMOOTHING) + prev_vx * _VELOCITY_SMOOTHING
+    vy = vy * (1.0 - _VELOCITY_SMOOTHING) + prev_vy * _VELOCITY_SMOOTHING
+
+    x, y = pedestrian.x, pedestrian.y
+    proposed_x = x + vx
+    proposed_y = y + vy
 
     if obstacles and pedestrian._would_collide(proposed_x, proposed_y, obstacles):
-        # Try sliding along each axis independently
-        if not pedestrian._would_collide(proposed_x, old_y, obstacles):
-            pedestrian.x = proposed_x
-        elif not pedestrian._would_collide(old_x, proposed_y, obstacles):
-            pedestrian.y = proposed_y
+        # Try sliding along each axis independently; both slides are tested
+        # in a single pass over the obstacles.
+        x_blocked, y_blocked = hitbox_slide_collisions(
+            x, y, proposed_x, proposed_y, pedestrian.radius, obstacles
+        )
+        if not x_blocked:
+            x = proposed_x
+        elif not y_blocked:
+            y = proposed_y
         else:
             # Fully blocked: reverse with stronger kick
-            pedestrian.vx *= -0.35
-            pedestrian.vy *= -0.35
+            vx *= -0.35
+            vy *= -0.35
             if rng is not None:
-                pedestrian.vx += float(rng.uniform(-0.25, 0.25))
-                pedestrian.vy += float(rng.uniform(-0.25, 0.25))
+                vx += float(rng.uniform(-0.25, 0.25))
+                vy += float(rng.uniform(-0.25, 0.25))
     else:
-        pedestrian.x = proposed_x
-        pedestrian.y = proposed_y
+        x = proposed_x
+        y = proposed_y
 
     # Clamp to screen
-    pedestrian.x = max(pedestrian.radius, min(WIDTH - pedestrian.radius, pedestrian.x))
-    pedestrian.y = max(pedestrian.radius, min(HEIGHT - pedestrian.radius, pedestrian.y))
-    _velocity_history[pid] = (pedestrian.vx, pedestrian.vy)
+    radius = pedestrian.radius
+    x = radius if x < radius else WIDTH - radius if x > WIDTH - radius else x
+    y = radius if y < radius else HEIGHT - radius if y > HEIGHT - radius else y
+    pedestrian.x = x
+    pedestrian.y = y
+    pedestrian.vx = vx
+    pedestrian.vy = vy
+    _velocity_history[pid] = (vx, vy)
 
     # ---- Stuck detection / recovery ----
     if pid in _stuck_counters:
         sx, sy, count, cooldown = _stuck_counters[pid]
         if cooldown > 0:
             cooldown -= 1
-        moved = math.hypot(pedestrian.x - sx, pedestrian.y - sy)
+        moved = math.hypot(x - sx, y - sy)
         if moved < _STUCK_MOVE_THRESHOLD:
             count += 1
         else:
             count = 0
-            sx, sy = pedestrian.x, pedestrian.y
+            sx, sy = x, y
         _stuck_counters[pid] = (sx, sy, count, cooldown)
 
         if count >= _STUCK_THRESHOLD_FRAMES and cooldown == 0:
@@ -518,6 +537,6 @@ def _apply_movement(pedestrian, obstacles = None, rng = None):
                 pedestrian.vx = math.cos(angle) * kick
                 pedestrian.vy = math.sin(angle) * kick
             _velocity_history[pid] = (pedestrian.vx, pedestrian.vy)
-            _stuck_counters[pid] = (pedestrian.x, pedestrian.y, 0, _STUCK_KICK_COOLDOWN)
+            _stuck_counters[pid] = (x, y, 0, _STUCK_KICK_COOLDOWN)
     else:
-        _stuck_counters[pid] = (pedestrian.x, pedestrian.y, 0, 0)
+        _stuck_counters[pid] = (x, y, 0, 0)
@@ -0,0 +1,171 @@
+"""
+Numba-compiled social-force kernels used by PedestrianSystem.
+
+Numba is an optional dependency. When it is not installed NUMBA_AVAILABLE is
+False, the decorators below become no-ops, and PedestrianSystem falls back to
+its NumPy broadcast path.
+"""
+
+import math
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        def decorator(fn):
+            return fn
+        return decorator
+
+
+# Explicit signatures compile the kernels eagerly for the float32 arrays
+# PedestrianSystem owns, so a float64 array or scalar can never trigger a
+# second, upcasting specialisation. Grid indices are int64.
+_REPULSION_SIGNATURE = (
+    "void(f4[::1], f4[::1], f4[::1], f4[::1], f4[::1], f4[::1], f4[::1], f4, f4, f4, "
+    "f4[::1], f4[::1], f4[::1], f4[::1])"
+)
+_REPULSION_GRID_SIGNATURE = (
+    "void(f4[::1], f4[::1], f4[::1], f4[::1], f4[::1], f4[::1], f4[::1], f4, f4, f4, "
+    "i8[::1], i8[::1], i8, i8, i8[::1], i8[::1], f4[::1], f4[::1], f4[::1], f4[::1])"
+)
+_REPULSION_PAIRS_SIGNATURE = (
+    "void(f4[::1], f4[::1], f4[::1], f4[::1], f4[::1], f4[::1], f4[::1], f4, f4, f4, "
+    "i8[::1], i8[::1], f4[::1], f4[::1], f4[::1], f4[::1])"
+)
+
+
+@njit(cache=True, fastmath=True, boundscheck=False)
+def _pair_force_scale(dx, dy, r_ij, a, b, cutoff_sq):
+    """Repulsion magnitude divided by distance, or 0 beyond the cutoff."""
+    dist_sq = dx * dx + dy * dy
+    if dist_sq >= cutoff_sq:
+        return 0.0
+    dist = math.sqrt(dist_sq)
+    if dist < 1e-6:
+        dist = 1e-6
+    return a * math.exp((r_ij - dist) / b) / dist
+
+
+@njit(cache=True, fastmath=True, boundscheck=False)
+def _wall_force(x, y, r, a, b, width, height):
+    """Repulsion from the four screen edges, each distance clamped to 1e-6."""
+    left = max(x, 1e-6)
+    right = max(width - x, 1e-6)
+    top = max(y, 1e-6)
+    bottom = max(height - y, 1e-6)
+    fx = a * (math.exp((r - left) / b) - math.exp((r - right) / b))
+    fy = a * (math.exp((r - top) / b) - math.exp((r - bottom) / b))
+    return fx, fy
+
+
+@njit(_REPULSION_SIGNATURE, cache=True, fastmath=True, boundscheck=False)
+def pedestrian_repulsion(xs, ys, radii, ped_A, ped_B, wall_A, wall_B, width, max_y, cutoff, out_fx, out_fy, out_wall_fx, out_wall_fy):
+    """
+    Exponential pedestrian-pedestrian and screen-edge repulsion for every
+    pedestrian, in one pass.
+
+    Pedestrians parked below ``max_y`` (off-screen respawn slots) are ignored
+    as sources of force, as are pairs further apart than ``cutoff``. The
+    screen is ``width`` x ``max_y``. Pedestrian forces go to ``out_fx`` /
+    ``out_fy`` and wall forces to ``out_wall_fx`` / ``out_wall_fy``.
+    """
+    n = xs.shape[0]
+    cutoff_sq = cutoff * cutoff
+    for i in range(n):
+        xi = xs[i]
+        yi = ys[i]
+        ri = radii[i]
+        a = ped_A[i]
+        b = ped_B[i]
+        fx = 0.0
+        fy = 0.0
+        for j in range(n):
+            if j == i:
+                continue
+            if ys[j] > max_y + radii[j]:
+                continue
+            dx = xi - xs[j]
+            dy = yi - ys[j]
+            scale = _pair_force_scale(dx, dy, ri + radii[j], a, b, cutoff_sq)
+            fx += scale * dx
+            fy += scale * dy
+        out_fx[i] = fx
+        out_fy[i] = fy
+        out_wall_fx[i], out_wall_fy[i] = _wall_force(xi, yi, ri, wall_A[i], wall_B[i], width, max_y)
+
+
+@njit(_REPULSION_GRID_SIGNATURE, parallel=True, cache=True, fastmath=True, boundscheck=False)
+def pedestrian_repulsion_grid(xs, ys, radii, ped_A, ped_B, wall_A, wall_B, width, max_y, cutoff, cell_x, cell_y, cols, rows, cell_start, cell_items, out_fx, out_fy, out_wall_fx, out_wall_fy):
+    """
+    Same as pedestrian_repulsion, but only visits the 3x3 block of uniform
+    grid cells (cell size >= cutoff) around each pedestrian.
+
+    ``cell_start`` / ``cell_items`` are a CSR-style bucket list: the
+    pedestrians in cell ``c`` are ``cell_items[cell_start[c]:cell_start[c + 1]]``.
+
+    Only used for large crowds, so the outer loop is spread across threads;
+    each iteration reads shared positions and writes only its own output slot.
+    """
+    n = xs.shape[0]
+    cutoff_sq = cutoff * cutoff
+    for i in prange(n):
+        xi = xs[i]
+        yi = ys[i]
+        ri = radii[i]
+        a = ped_A[i]
+        b = ped_B[i]
+        cx = cell_x[i]
+        cy = cell_y[i]
+        fx = 0.0
+        fy = 0.0
+        for gy in range(max(cy - 1, 0), min(cy + 2, rows)):
+            for gx in range(max(cx - 1, 0), min(cx + 2, cols)):
+                cell = gy * cols + gx
+                for k in range(cell_start[cell], cell_start[cell + 1]):
+                    j = cell_items[k]
+                    if j == i:
+                        continue
+                    if ys[j] > max_y + radii[j]:
+                        continue
+                    dx = xi - xs[j]
+                    dy = yi - ys[j]
+                    scale = _pair_force_scale(dx, dy, ri + radii[j], a, b, cutoff_sq)
+                    fx += scale * dx
+                    fy += scale * dy
+        out_fx[i] = fx
+        out_fy[i] = fy
+        out_wall_fx[i], out_wall_fy[i] = _wall_force(xi, yi, ri, wall_A[i], wall_B[i], width, max_y)
+
+
+@njit(_REPULSION_PAIRS_SIGNATURE, cache=True, fastmath=True, boundscheck=False)
+def pedestrian_repulsion_pairs(xs, ys, radii, ped_A, ped_B, wall_A, wall_B, width, max_y, cutoff, pair_i, pair_j, out_fx, out_fy, out_wall_fx, out_wall_fy):
+    """
+    Same as pedestrian_repulsion, over an explicit candidate pair list
+    (e.g. from a KD-tree). Each unordered pair (pair_i[k], pair_j[k]) is
+    listed once and its force applied to both pedestrians, so the loop is
+    serial.
+    """
+    n = xs.shape[0]
+    cutoff_sq = cutoff * cutoff
+    for i in range(n):
+        out_fx[i] = 0.0
+        out_fy[i] = 0.0
+        out_wall_fx[i], out_wall_fy[i] = _wall_force(xs[i], ys[i], radii[i], wall_A[i], wall_B[i], width, max_y)
+    for k in range(pair_i.shape[0]):
+        i = pair_i[k]
+        j = pair_j[k]
+        dx = xs[i] - xs[j]
+        dy = ys[i] - ys[j]
+        r_ij = radii[i] + radii[j]
+        if ys[j] <= max_y + radii[j]:
+            scale = _pair_force_scale(dx, dy, r_ij, ped_A[i], ped_B[i], cutoff_sq)
+            out_fx[i] += scale * dx
+            out_fy[i] += scale * dy
+        if ys[i] <= max_y + radii[i]:
+            scale = _pair_force_scale(dx, dy, r_ij, ped_A[j], ped_B[j], cutoff_sq)
+            out_fx[j] -= scale * dx
+            out_fy[j] -= scale * dy
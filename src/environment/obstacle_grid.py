@@ -0,0 +1,97 @@
+from constants import HEIGHT, WIDTH
+
+
+def hitbox_collides(x, y, half_size, obstacles):
+    """
+    Whether the square hitbox Rect(int(x - h), int(y - h), 2h, 2h) overlaps any
+    obstacle rect. Same result as colliderect on that hitbox, without building
+    a Rect per test.
+    """
+    left = int(x - half_size)
+    top = int(y - half_size)
+    size = int(half_size * 2)
+    right = left + size
+    bottom = top + size
+    for rect in obstacles:
+        if left < rect.right and rect.left < right and top < rect.bottom and rect.top < bottom:
+            return True
+    return False
+
+
+def hitbox_slide_collisions(x, y, new_x, new_y, half_size, obstacles):
+    """
+    (x_only, y_only) collision flags for the axis-slide fallbacks of a move
+    from (x, y) to (new_x, new_y): hitboxes at (new_x, y) and (x, new_y).
+
+    One pass over the obstacles, same results as two hitbox_collides calls.
+    The x and y overlap tests are separable, so each obstacle is compared
+    once per edge position.
+    """
+    size = int(half_size * 2)
+    old_left = int(x - half_size)
+    new_left = int(new_x - half_size)
+    old_top = int(y - half_size)
+    new_top = int(new_y - half_size)
+    old_right = old_left + size
+    new_right = new_left + size
+    old_bottom = old_top + size
+    new_bottom = new_top + size
+    x_only = y_only = False
+    for rect in obstacles:
+        r_left, r_top, r_right, r_bottom = rect.left, rect.top, rect.right, rect.bottom
+        if not x_only and new_left < r_right and r_left < new_right and old_top < r_bottom and r_top < old_bottom:
+            x_only = True
+        if not y_only and old_left < r_right and r_left < old_right and new_top < r_bottom and r_top < new_bottom:
+            y_only = True
+        if x_only and y_only:
+            break
+    return x_only, y_only
+
+
+class ObstacleGrid:
+    """
+    Uniform-grid index over a scenario's static obstacle rects.
+
+    For each query reach, every cell gets the list of obstacles overlapping it
+    once grown by that reach. The list is built on first use and cached, since
+    callers query with a handful of fixed reaches per episode. near() is then
+    a single cell lookup.
+    """
+
+    def __init__(self, obstacles, cell_size = 64):
+        self.obstacles = obstacles
+        self.cell_size = cell_size
+        self.cols = WIDTH // cell_size + 1
+        self.rows = HEIGHT // cell_size + 1
+        self._cells_by_reach = {}
+
+    def near(self, x, y, reach):
+        """
+        Obstacles that may lie within *reach* of (x, y), in their original
+        order: every obstacle overlapping the square of half-size *reach*
+        around the point is included, plus possibly a few just beyond it.
+        """
+        cells = self._cells_by_reach.get(reach)
+        if cells is None:
+            cells = self._build_cells(reach)
+            self._cells_by_reach[reach] = cells
+        size = self.cell_size
+        # Clamp to the grid; border cells also cover everything off-screen.
+        col = min(max(int(x // size), 0), self.cols - 1)
+        row = min(max(int(y // size), 0), self.rows - 1)
+        return cells[row * self.cols + col]
+
+    def _build_cells(self, reach):
+        size = self.cell_size
+        cells = []
+        for row in range(self.rows):
+            top = row * size - reach if row > 0 else float("-inf")
+            bottom = (row + 1) * size + reach if row < self.rows - 1 else float("inf")
+            for col in range(self.cols):
+                left = col * size - reach if col > 0 else float("-inf")
+                right = (col + 1) * size + reach if col < self.cols - 1 else float("inf")
+                cells.append([
+                    rect for rect in self.obstacles
+                    if rect.right >= left and rect.left <= right and rect.bottom >= top and rect.top <= bottom
+                ])
+        return cells
@@ -32,6 +32,14 @@ class NavGrid:
             r_max = min(self.rows, inflated.bottom // CELL_SIZE + 1)
             self.blocked[r_min:r_max, c_min:c_max] = True
 
+        # Flat copy of the grid with a blocked one-cell border, for the
+        # pure-Python search loops: cell (r, c) is at (r + 1) * stride + c + 1,
+        # so neighbour lookups need no bounds checks or NumPy indexing.
+        self._stride = self.cols + 2
+        padded = np.ones((self.rows + 2, self.cols + 2), dtype=bool)
+        padded[1:-1, 1:-1] = self.blocked
+        self._blocked_flat = padded.ravel().tolist()
+
     # ------------------------------------------------------------------
     # Coordinate helpers
     # ------------------------------------------------------------------
@@ -60,55 +68,72 @@ class NavGrid:
         if (sr, sc) == (gr, gc):
             return [goal]
 
-        # A* with 8-directional movement
+        # A* with 8-directional movement, over flat padded cell indices.
+        # Heap entries are (f, index, r, c); index order matches (r, c)
+        # order, so ties pop exactly as they would with (f, r, c).
         SQRT2 = math.sqrt(2)
+        stride = self._stride
+        blocked = self._blocked_flat
+        # (dr, dc, cost, index offset, side-cell offsets for corner cutting)
         neighbors = [
-            (-1, 0, 1.0),
-            (1, 0, 1.0),
-            (0, -1, 1.0),
-            (0, 1, 1.0),
-            (-1, -1, SQRT2),
-            (-1, 1, SQRT2),
-            (1, -1, SQRT2),
-            (1, 1, SQRT2),
+            (-1, 0, 1.0, -stride, None),
+            (1, 0, 1.0, stride, None),
+            (0, -1, 1.0, -1, None),
+            (0, 1, 1.0, 1, None),
+            (-1, -1, SQRT2, -stride - 1, (-stride, -1)),
+            (-1, 1, SQRT2, -stride + 1, (-stride, 1)),
+            (1, -1, SQRT2, stride - 1, (stride, -1)),
+            (1, 1, SQRT2, stride + 1, (stride, 1)),
         ]
 
-        open_set = []
-        heapq.heappush(open_set, (0.0, sr, sc))
-        came_from = {}
-        g_score = {(sr, sc): 0.0}
+        inf = float("inf")
+        start_idx = (sr + 1) * stride + sc + 1
+        goal_idx = (gr + 1) * stride + gc + 1
+        g_score = [inf] * len(blocked)
+        came_from = [-1] * len(blocked)
+        # g at which each cell was last expanded; popping a cell again with
+        # an unchanged g cannot improve any neighbour, so it is skipped.
+        expanded_g = [None] * len(blocked)
+        g_score[start_idx] = 0.0
+        open_set = [(0.0, start_idx, sr, sc)]
+        hypot = math.hypot
+        heappush = heapq.heappush
+        heappop = heapq.heappop
 
         while open_set:
-            _, cr, cc = heapq.heappop(open_set)
+            _, idx, cr, cc = heappop(open_set)
 
-            if (cr, cc) == (gr, gc):
+            if idx == goal_idx:
                 # Reconstruct and smooth
                 raw = []
-                node = (gr, gc)
-                while node in came_from:
-                    raw.append(self.grid_to_world(*node))
-                    node = came_from[node]
+                while came_from[idx] >= 0:
+                    r, c = divmod(idx, stride)
+                    raw.append(self.grid_to_world(r - 1, c - 1))
+                    idx = came_from[idx]
                 raw.reverse()
                 raw.append(goal)  # end with exact goal position
                 return self._smooth_path(raw)
 
-            for dr, dc, cost in neighbors:
-                nr, nc = cr + dr, cc + dc
-                if not (0 <= nr < self.rows and 0 <= nc < self.cols):
-                    continue
-                if self.blocked[nr, nc]:
+            g = g_score[idx]
+            if expanded_g[idx] == g:
+                continue
+            expanded_g[idx] = g
+
+            for dr, dc, cost, offset, sides in neighbors:
+                n_idx = idx + offset
+                if blocked[n_idx]:
                     continue
                 # Prevent corner-cutting through diagonal obstacles
-                if dr != 0 and dc != 0:
-                    if self.blocked[cr + dr, cc] or self.blocked[cr, cc + dc]:
-                        continue
+                if sides is not None and (blocked[idx + sides[0]] or blocked[idx + sides[1]]):
+                    continue
 
-                new_g = g_score[(cr, cc)] + cost
-                if new_g < g_score.get((nr, nc), float("inf")):
-                    g_score[(nr, nc)] = new_g
-                    h = math.hypot(nr - gr, nc - gc)
-                    heapq.heappush(open_set, (new_g + h, nr, nc))
-                    came_from[(nr, nc)] = (cr, cc)
+                new_g = g + cost
+                if new_g < g_score[n_idx]:
+                    g_score[n_idx] = new_g
+                    nr, nc = cr + dr, cc + dc
+                    h = hypot(nr - gr, nc - gc)
+                    heappush(open_set, (new_g + h, n_idx, nr, nc))
+                    came_from[n_idx] = idx
 
         # No path found — fall back to direct line
         return [goal]
@@ -161,11 +186,13 @@ class NavGrid:
         if dist < 1e-6:
             return True
         steps = max(1, int(dist / (self.cell_size * 0.5)))
+        blocked = self._blocked_flat
+        stride = self._stride
         for i in range(steps + 1):
             t = i / steps
             x = a[0] + dx * t
             y = a[1] + dy * t
             r, c = self.world_to_grid(x, y)
-            if self.blocked[r, c]:
+            if blocked[(r + 1) * stride + c + 1]:
                 return False
         return True
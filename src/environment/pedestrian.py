@@ -1,13 +1,47 @@
 from dataclasses import dataclass, field
 import math
+import numpy as np
 import pygame
 
 from constants import HEIGHT, WIDTH, SIM_SECONDS_PER_STEP, WORLD_METERS_PER_PIXEL
+from environment.forces_numba import (
+    NUMBA_AVAILABLE,
+    pedestrian_repulsion,
+    pedestrian_repulsion_grid,
+    pedestrian_repulsion_pairs,
+)
+from environment.obstacle_grid import hitbox_collides
+from environment.quadtree import Quadtree
+from environment.sprites import circle_sprite
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # scipy is optional; very large crowds then use the grid / sweep paths.
+    cKDTree = None
 
 PEDESTRIAN_COLOR = (10, 155, 110)
 GOAL_COLOR = (255, 200, 0)
 
-@dataclass
+# Pairs further apart than max(r_ij) + REPULSION_CUTOFF_B * max(ped_B) are
+# skipped: the exponential repulsion there is below ped_A * e^-7.
+REPULSION_CUTOFF_B = 7.0
+# Crowd size from which the compiled kernel switches to a uniform-grid broad phase.
+GRID_MIN_PEDESTRIANS = 48
+# Crowd size from which the NumPy fallback sweeps and prunes on x instead of
+# broadcasting over every pair.
+SWEEP_MIN_PEDESTRIANS = 96
+# Crowd sizes from which candidate pairs come from a scipy KD-tree (when
+# installed): it beats the NumPy sweep from a few hundred pedestrians, but
+# only overtakes the compiled grid kernel for crowds in the thousands.
+KDTREE_MIN_PEDESTRIANS = 500
+KDTREE_MIN_PEDESTRIANS_NUMBA = 3000
+# Obstacle query reaches are rounded up to this many px (see obstacle_reach()).
+OBSTACLE_REACH_QUANTUM = 8
+# Float32 copies of the screen size, matching the kernels' f4 scalar arguments.
+_WIDTH_F32 = np.float32(WIDTH)
+_HEIGHT_F32 = np.float32(HEIGHT)
+
+@dataclass(slots=True)
 class Pedestrian:
     x: float
     y: float
@@ -28,6 +62,10 @@ class Pedestrian:
     _waypoints: list[tuple[float, float]] = field(default_factory=list, repr=False)
     _waypoint_idx: int = field(default=0, repr=False)
 
+    # Pedestrian-pedestrian and wall repulsion precomputed by PedestrianSystem.step()
+    _social_force: tuple[float, float] | None = field(default=None, repr=False)
+    _wall_force: tuple[float, float] | None = field(default=None, repr=False)
+
     desired_speed: float = 1.5
     relaxation_time: float = 18.0
     max_speed: float = 3.0
@@ -94,19 +132,23 @@ class Pedestrian:
         # Advance past reached waypoints
         while self._waypoint_idx < len(self._waypoints) - 1:
             wx, wy = self._waypoints[self._waypoint_idx]
-            if math.hypot(wx - self.x, wy - self.y) < 18.0:
+            dx = wx - self.x
+            dy = wy - self.y
+            if dx * dx + dy * dy < 18.0 * 18.0:
                 self._waypoint_idx += 1
             else:
                 break
 
         return self._waypoints[self._waypoint_idx]
 
-    def _self_driving_force(self):
+    # Hot force terms bind math functions as default arguments so the inner
+    # loops use fast local lookups instead of global + attribute lookups.
+    def _self_driving_force(self, _hypot=math.hypot):
         """Social-force drive toward current waypoint (not final goal)."""
         tx, ty = self.get_steering_target()
         dx = tx - self.x
         dy = ty - self.y
-        dist = math.hypot(dx, dy)
+        dist = _hypot(dx, dy)
         if dist < 1e-6:
             return 0.0, 0.0
         ex, ey = dx / dist, dy / dist
@@ -115,66 +157,73 @@ class Pedestrian:
         fy = (desired_speed * ey - self.vy) / self.relaxation_time
         return fx, fy
 
-    def _pedestrian_repulsion(self, others):
+    def _pedestrian_repulsion(self, others, _exp=math.exp, _hypot=math.hypot):
+        if self._social_force is not None:
+            return self._social_force
         fx, fy = 0.0, 0.0
+        x, y, radius = self.x, self.y, self.radius
+        ped_A, ped_B = self.ped_A, self.ped_B
         for other in others:
             if other is self:
                 continue
             if other.y > HEIGHT + other.radius:
                 continue
-            dx = self.x - other.x
-            dy = self.y - other.y
-            dist = math.hypot(dx, dy)
+            dx = x - other.x
+            dy = y - other.y
+            dist = _hypot(dx, dy)
             if dist < 1e-6:
                 dist = 1e-6
             nx, ny = dx / dist, dy / dist
-            r_ij = self.radius + other.radius
-            magnitude = self.ped_A * math.exp((r_ij - dist) / self.ped_B)
+            r_ij = radius + other.radius
+            magnitude = ped_A * _exp((r_ij - dist) / ped_B)
             fx += magnitude * nx
             fy += magnitude * ny
         return fx, fy
 
-    def _wall_repulsion(self):
-        fx, fy = 0.0, 0.0
-        walls = [
-            (self.x,            1.0,  0.0),   # left
-            (WIDTH - self.x,   -1.0,  0.0),   # right
-            (self.y,            0.0,  1.0),   # top
-            (HEIGHT - self.y,   0.0, -1.0),   # bottom
-        ]
-        for dist, nx, ny in walls:
-            if dist < 1e-6:
-                dist = 1e-6
-            magnitude = self.wall_A * math.exp((self.radius - dist) / self.wall_B)
-            fx += magnitude * nx
-            fy += magnitude * ny
+    def _wall_repulsion(self, _exp=math.exp):
+        if self._wall_force is not None:
+            return self._wall_force
+        if self.wall_A == 0.0:
+            return 0.0, 0.0
+        # The four screen edges, unrolled: left/right push along x, top/bottom along y.
+        r = self.radius
+        b = self.wall_B
+        left = max(self.x, 1e-6)
+        right = max(WIDTH - self.x, 1e-6)
+        top = max(self.y, 1e-6)
+        bottom = max(HEIGHT - self.y, 1e-6)
+        fx = self.wall_A * (_exp((r - left) / b) - _exp((r - right) / b))
+        fy = self.wall_A * (_exp((r - top) / b) - _exp((r - bottom) / b))
         return fx, fy
 
-    def _obstacle_repulsion(self, obstacles):
+    def _obstacle_repulsion(self, obstacles, _exp=math.exp, _hypot=math.hypot):
         """Repulsive force from nearby obstacles (walls, furniture, etc.)."""
         fx, fy = 0.0, 0.0
         if not obstacles:
             return fx, fy
+        x, y, radius = self.x, self.y, self.radius
+        obstacle_A, obstacle_B = self.obstacle_A, self.obstacle_B
+        obstacle_range = self.obstacle_range
         for rect in obstacles:
             # Closest point on the rect to the pedestrian centre
-            closest_x = max(rect.left, min(self.x, rect.right))
-            closest_y = max(rect.top, min(self.y, rect.bottom))
-            dx = self.x - closest_x
-            dy = self.y - closest_y
-            dist = math.hypot(dx, dy)
+            closest_x = max(rect.left, min(x, rect.right))
+            closest_y = max(rect.top, min(y, rect.bottom))
+            dx = x - closest_x
+            dy = y - closest_y
+            dist = _hypot(dx, dy)
             if dist < 1e-6:
                 # Inside the obstacle — push away from centre
                 cx = rect.centerx
                 cy = rect.centery
-                dx = self.x - cx
-                dy = self.y - cy
-                dist = math.hypot(dx, dy)
+                dx = x - cx
+                dy = y - cy
+                dist = _hypot(dx, dy)
                 if dist < 1e-6:
                     dx, dy, dist = 1.0, 0.0, 1.0
-            if dist < self.obstacle_range:
+            if dist < obstacle_range:
                 nx, ny = dx / dist, dy / dist
-                magnitude = self.obstacle_A * math.exp(
-                    (self.radius - dist) / self.obstacle_B
+                magnitude = obstacle_A * _exp(
+                    (radius - dist) / obstacle_B
                 )
                 fx += magnitude * nx
                 fy += magnitude * ny
@@ -197,30 +246,398 @@ class Pedestrian:
             default_behavior.update(self, others, obstacles, rng)
 
     def has_reached_goal(self, threshold = 15.0):
-        return math.hypot(self.goal_x - self.x, self.goal_y - self.y) < threshold
+        dx = self.goal_x - self.x
+        dy = self.goal_y - self.y
+        return dx * dx + dy * dy < threshold * threshold
 
     def _would_collide(self, x, y, obstacles):
-        hitbox = pygame.Rect(
-            int(x - self.radius),
-            int(y - self.radius),
-            self.radius * 2,
-            self.radius * 2,
-        )
-        return any(hitbox.colliderect(obstacle) for obstacle in obstacles)
+        return hitbox_collides(x, y, self.radius, obstacles)
 
     def draw(self, surface):
-        # Draw waypoint path (faint)
-        if self._waypoints and len(self._waypoints) > 1:
-            pts = [(int(self.x), int(self.y))]
-            for wp in self._waypoints[self._waypoint_idx:]:
-                pts.append((int(wp[0]), int(wp[1])))
-            if len(pts) >= 2:
-                pygame.draw.lines(surface, (180, 220, 180), False, pts, 1)
-
-        pygame.draw.circle(surface, GOAL_COLOR, (int(self.goal_x), int(self.goal_y)), 4)
-        pygame.draw.line(
-            surface, (255, 255, 255),
+        """Draw the pedestrian and return the bounding Rect of everything drawn."""
+        return _draw_pedestrian(
+            surface,
+            self,
             (int(self.x), int(self.y)),
-            (int(self.x + self.vx * 8), int(self.y + self.vy * 8)), 2
+            (int(self.x + self.vx * 8), int(self.y + self.vy * 8)),
+            (int(self.goal_x), int(self.goal_y)),
+        )
+
+
+def _draw_pedestrian(surface, ped, center, heading_end, goal):
+    """Draw one pedestrian from pre-cast integer screen points; returns the bounding Rect."""
+    drawn = []
+    # Draw waypoint path (faint)
+    if ped._waypoints and len(ped._waypoints) > 1:
+        pts = [center]
+        for wp in ped._waypoints[ped._waypoint_idx:]:
+            pts.append((int(wp[0]), int(wp[1])))
+        if len(pts) >= 2:
+            drawn.append(pygame.draw.lines(surface, (180, 220, 180), False, pts, 1))
+
+    # Goal dot and body are blitted from cached circle sprites.
+    drawn.append(surface.blit(circle_sprite(GOAL_COLOR, 4), (goal[0] - 4, goal[1] - 4)))
+    drawn.append(pygame.draw.line(surface, (255, 255, 255), center, heading_end, 2))
+    r = ped.radius
+    body = surface.blit(circle_sprite(PEDESTRIAN_COLOR, r), (center[0] - r, center[1] - r))
+    return body.unionall(drawn)
+
+
+class PedestrianSystem:
+    """
+    Structure-of-arrays mirror of a pedestrian crowd.
+
+    Positions, velocities, goals and social-force parameters are kept in
+    contiguous float32 arrays so pedestrian-pedestrian repulsion can be
+    evaluated for the whole crowd with one broadcast instead of an O(N^2)
+    Python loop. The Pedestrian objects still own behavior, waypoint and
+    drawing state.
+    """
+
+    def __init__(self, pedestrians):
+        self.pedestrians = pedestrians
+        count = len(pedestrians)
+        self.xs = np.zeros(count, dtype=np.float32)
+        self.ys = np.zeros(count, dtype=np.float32)
+        self.vxs = np.zeros(count, dtype=np.float32)
+        self.vys = np.zeros(count, dtype=np.float32)
+        self.goal_x = np.zeros(count, dtype=np.float32)
+        self.goal_y = np.zeros(count, dtype=np.float32)
+
+        # Per-pedestrian constants (fixed for the lifetime of an episode).
+        self.radii = np.array([ped.radius for ped in pedestrians], dtype=np.float32)
+        self.ped_A = np.array([ped.ped_A for ped in pedestrians], dtype=np.float32)
+        self.ped_B = np.array([ped.ped_B for ped in pedestrians], dtype=np.float32)
+        self.wall_A = np.array([ped.wall_A for ped in pedestrians], dtype=np.float32)
+        self.wall_B = np.array([ped.wall_B for ped in pedestrians], dtype=np.float32)
+        if count:
+            self.cutoff = np.float32(2.0 * self.radii.max() + REPULSION_CUTOFF_B * self.ped_B.max())
+        else:
+            self.cutoff = np.float32(0.0)
+
+        # Broad phase: KD-tree pairs for very large crowds, otherwise a
+        # uniform grid (cell size = cutoff) for the compiled kernel.
+        kdtree_min = KDTREE_MIN_PEDESTRIANS_NUMBA if NUMBA_AVAILABLE else KDTREE_MIN_PEDESTRIANS
+        self.use_kdtree = cKDTree is not None and count >= kdtree_min
+        self.use_grid = NUMBA_AVAILABLE and not self.use_kdtree and count >= GRID_MIN_PEDESTRIANS
+        if self.use_grid:
+            self.grid_cols = int(WIDTH // self.cutoff) + 1
+            self.grid_rows = int(HEIGHT // self.cutoff) + 1
+            self.cell_start = np.zeros(self.grid_cols * self.grid_rows + 1, dtype=np.int64)
+
+        # Per-step force outputs, allocated once and overwritten every step.
+        self.ped_fx = np.zeros(count, dtype=np.float32)
+        self.ped_fy = np.zeros(count, dtype=np.float32)
+        self.wall_fx = np.zeros(count, dtype=np.float32)
+        self.wall_fy = np.zeros(count, dtype=np.float32)
+        self._index_by_id = {id(ped): i for i, ped in enumerate(pedestrians)}
+        self._quadtree = None
+        self._offsets_key = None
+        self._offsets = None
+        self._distances = None
+        self.sync()
+
+    def __len__(self):
+        return len(self.pedestrians)
+
+    def __iter__(self):
+        return iter(self.pedestrians)
+
+    def sync(self):
+        """Copy the mutable per-pedestrian state into the arrays."""
+        peds = self.pedestrians
+        self.xs[:] = [ped.x for ped in peds]
+        self.ys[:] = [ped.y for ped in peds]
+        self.vxs[:] = [ped.vx for ped in peds]
+        self.vys[:] = [ped.vy for ped in peds]
+        self.goal_x[:] = [ped.goal_x for ped in peds]
+        self.goal_y[:] = [ped.goal_y for ped in peds]
+        self._quadtree = None
+        self._offsets_key = None
+
+    def offsets_from(self, x, y):
+        """
+        (dx, dy, dist_sq) arrays from every pedestrian to the point (x, y).
+
+        Cached until the next sync(), so the robot-pedestrian distances are
+        computed once per frame and shared by every consumer.
+        """
+        key = (x, y)
+        if self._offsets_key != key:
+            dx = x - self.xs
+            dy = y - self.ys
+            self._offsets = (dx, dy, dx * dx + dy * dy)
+            self._offsets_key = key
+            self._distances = None
+        return self._offsets
+
+    def distances_from(self, x, y):
+        """Euclidean distances from every pedestrian to (x, y); shares the offsets cache."""
+        _, _, dist_sq = self.offsets_from(x, y)
+        if self._distances is None:
+            self._distances = np.sqrt(dist_sq)
+        return self._distances
+
+    def indices_of(self, ped_ids):
+        """Crowd indices for the given id(ped) keys; ids not in this crowd are skipped."""
+        index_by_id = self._index_by_id
+        return [index_by_id[pid] for pid in ped_ids if pid in index_by_id]
+
+    def select(self, pedestrians):
+        """View of a subset of this crowd (e.g. the ray-visible pedestrians)."""
+        indices = np.array([self._index_by_id[id(ped)] for ped in pedestrians], dtype=np.intp)
+        return PedestrianSelection(self, indices)
+
+    def quadtree(self):
+        """Quadtree over the synced positions keyed by index; rebuilt lazily after sync()."""
+        if self._quadtree is None:
+            tree = Quadtree((0.0, 0.0, float(WIDTH), float(HEIGHT)))
+            for i, (x, y, r) in enumerate(zip(self.xs.tolist(), self.ys.tolist(), self.radii.tolist())):
+                tree.insert(i, x, y, r)
+            self._quadtree = tree
+        return self._quadtree
+
+    def nearby(self, x, y, reach):
+        """Pedestrians whose bounding box comes within *reach* of (x, y), in crowd order."""
+        ids = self.quadtree().query((x - reach, y - reach, x + reach, y + reach))
+        return [self.pedestrians[i] for i in sorted(ids)]
+
+    def near_goal_mask(self, threshold = 15.0):
+        """
+        Boolean mask of pedestrians within *threshold* of their goal, from the
+        synced arrays. Padded slightly for float32 rounding, so it may include
+        a pedestrian just outside the threshold but never misses one inside;
+        confirm with Pedestrian.has_reached_goal().
+        """
+        reach = threshold + 0.5
+        dx = self.goal_x - self.xs
+        dy = self.goal_y - self.ys
+        return dx * dx + dy * dy < reach * reach
+
+    def draw(self, surface):
+        """
+        Draw the whole crowd in one pass over the synced arrays.
+
+        Returns one bounding Rect per pedestrian.
+        """
+        # Cast every screen coordinate to int in one batch (astype truncates
+        # toward zero like int()), then hand out ready-made point tuples.
+        centers = zip(self.xs.astype(np.int32).tolist(), self.ys.astype(np.int32).tolist())
+        heading_ends = zip(
+            (self.xs + self.vxs * 8).astype(np.int32).tolist(),
+            (self.ys + self.vys * 8).astype(np.int32).tolist(),
+        )
+        goals = zip(self.goal_x.astype(np.int32).tolist(), self.goal_y.astype(np.int32).tolist())
+        return [
+            _draw_pedestrian(surface, ped, center, heading_end, goal)
+            for ped, center, heading_end, goal in zip(self.pedestrians, centers, heading_ends, goals)
+        ]
+
+    def step(self, obstacles = None, rng = None, goal_dwell_frames = None, obstacle_grid = None):
+        """
+        Advance every pedestrian by one simulation step.
+
+        With an ObstacleGrid over *obstacles*, each pedestrian only sees the
+        obstacles within obstacle_reach() of it.
+        """
+        self.sync()
+        # A pedestrian's own position is untouched until its update runs, so
+        # wall forces from the synced positions are exactly what it would compute.
+        self._compute_social_forces()
+        force_x = self.ped_fx.tolist()
+        force_y = self.ped_fy.tolist()
+        wall_x = self.wall_fx.tolist()
+        wall_y = self.wall_fy.tolist()
+        reach = self.obstacle_reach() if obstacle_grid is not None else None
+        for i, ped in enumerate(self.pedestrians):
+            if goal_dwell_frames and goal_dwell_frames.get(id(ped), 0) > 0:
+                # Hold briefly at destination before choosing the next activity.
+                ped.vx *= 0.5
+                ped.vy *= 0.5
+                continue
+            ped._social_force = (force_x[i], force_y[i])
+            ped._wall_force = (wall_x[i], wall_y[i])
+            if obstacle_grid is not None:
+                local_obstacles = obstacle_grid.near(ped.x, ped.y, reach)
+            else:
+                local_obstacles = obstacles
+            ped.update(self.pedestrians, local_obstacles, rng=rng)
+            ped._social_force = None
+            ped._wall_force = None
+        self.sync()
+
+    def obstacle_reach(self):
+        """
+        Obstacle query half-size for this step: obstacle repulsion range plus
+        one capped step of movement for the collision probe, with slack for
+        the int-truncated hitbox.
+
+        Uses the current max speeds, since callers (multi_env, benchmark)
+        rescale them after the crowd is built. Rounded up to a multiple of
+        OBSTACLE_REACH_QUANTUM so ObstacleGrid only caches a few reaches.
+        """
+        reach = max(
+            (ped.radius + ped.obstacle_range + ped.max_speed_step() + 4.0 for ped in self.pedestrians),
+            default=0.0,
+        )
+        return math.ceil(reach / OBSTACLE_REACH_QUANTUM) * OBSTACLE_REACH_QUANTUM
+
+    def _compute_social_forces(self):
+        """
+        Fill ped_fx/ped_fy and wall_fx/wall_fy for the whole crowd. The numba
+        kernels compute both in a single pass; the NumPy fallback runs the
+        two separately.
+        """
+        if len(self.pedestrians) == 0:
+            return
+        if self.use_kdtree:
+            i, j = self._kdtree_pairs()
+            if NUMBA_AVAILABLE:
+                pedestrian_repulsion_pairs(
+                    self.xs, self.ys, self.radii, self.ped_A, self.ped_B,
+                    self.wall_A, self.wall_B, _WIDTH_F32, _HEIGHT_F32, self.cutoff,
+                    i, j, self.ped_fx, self.ped_fy, self.wall_fx, self.wall_fy,
+                )
+            else:
+                self._pair_repulsion(i, j)
+                self._compute_wall_repulsion()
+            return
+        if self.use_grid:
+            cell_x, cell_y, cell_items = self._build_cell_list()
+            pedestrian_repulsion_grid(
+                self.xs, self.ys, self.radii, self.ped_A, self.ped_B,
+                self.wall_A, self.wall_B, _WIDTH_F32, _HEIGHT_F32, self.cutoff,
+                cell_x, cell_y, self.grid_cols, self.grid_rows,
+                self.cell_start, cell_items,
+                self.ped_fx, self.ped_fy, self.wall_fx, self.wall_fy,
+            )
+            return
+        if NUMBA_AVAILABLE:
+            pedestrian_repulsion(
+                self.xs, self.ys, self.radii, self.ped_A, self.ped_B,
+                self.wall_A, self.wall_B, _WIDTH_F32, _HEIGHT_F32, self.cutoff,
+                self.ped_fx, self.ped_fy, self.wall_fx, self.wall_fy,
+            )
+            return
+        self._compute_pedestrian_repulsion()
+        self._compute_wall_repulsion()
+
+    def _compute_wall_repulsion(self):
+        """Batched equivalent of Pedestrian._wall_repulsion, written into wall_fx/wall_fy."""
+        xs, ys, radii, b = self.xs, self.ys, self.radii, self.wall_B
+        # Pedestrian._wall_repulsion clamps each edge distance to 1e-6.
+        left = np.maximum(xs, 1e-6)
+        right = np.maximum(WIDTH - xs, 1e-6)
+        top = np.maximum(ys, 1e-6)
+        bottom = np.maximum(HEIGHT - ys, 1e-6)
+        self.wall_fx[:] = self.wall_A * (np.exp((radii - left) / b) - np.exp((radii - right) / b))
+        self.wall_fy[:] = self.wall_A * (np.exp((radii - top) / b) - np.exp((radii - bottom) / b))
+
+    def _compute_pedestrian_repulsion(self):
+        """NumPy batched equivalent of Pedestrian._pedestrian_repulsion for every pedestrian."""
+        if len(self.pedestrians) >= SWEEP_MIN_PEDESTRIANS:
+            self._sweep_and_prune_repulsion()
+            return
+
+        xs, ys, radii = self.xs, self.ys, self.radii
+        dx = xs[:, None] - xs[None, :]
+        dy = ys[:, None] - ys[None, :]
+        dist = np.sqrt(dx * dx + dy * dy)
+        np.maximum(dist, 1e-6, out=dist)
+        # Self-pairs, pairs beyond the cutoff and pedestrians parked below
+        # the screen exert no force.
+        dist[dist >= self.cutoff] = np.inf
+        np.fill_diagonal(dist, np.inf)
+        dist[:, ys > HEIGHT + radii] = np.inf
+
+        r_ij = radii[:, None] + radii[None, :]
+        mag = self.ped_A[:, None] * np.exp((r_ij - dist) / self.ped_B[:, None]) / dist
+        self.ped_fx[:] = (mag * dx).sum(axis=1)
+        self.ped_fy[:] = (mag * dy).sum(axis=1)
+
+    def _sweep_and_prune_repulsion(self):
+        """
+        NumPy repulsion over candidate pairs only: pedestrians are sorted by x
+        and each is paired with the ones ahead of it that lie less than
+        ``cutoff`` further along x. Every unordered pair is visited once and
+        its force applied to both pedestrians.
+        """
+        xs = self.xs
+        count = len(xs)
+        order = np.argsort(xs, kind="stable")
+        sorted_x = xs[order]
+        ends = np.searchsorted(sorted_x, sorted_x + self.cutoff, side="left")
+        positions = np.arange(count)
+        partners = np.maximum(ends - positions - 1, 0)
+
+        # Expand to (first, second) positions in sorted order, second > first.
+        first = np.repeat(positions, partners)
+        pair_starts = np.repeat(np.cumsum(partners) - partners, partners)
+        second = first + 1 + (np.arange(len(first)) - pair_starts)
+        self._pair_repulsion(order[first], order[second])
+
+    def _kdtree_pairs(self):
+        """Unordered index pairs (i, j) closer than the cutoff, from a scipy KD-tree."""
+        tree = cKDTree(np.column_stack((self.xs, self.ys)))
+        # Query slightly past the cutoff so float32 rounding in the kernels
+        # can never see a pair the float64 tree dropped; they re-test it.
+        pairs = tree.query_pairs(r=float(self.cutoff) * (1.0 + 1e-5), output_type="ndarray")
+        return (
+            np.ascontiguousarray(pairs[:, 0], dtype=np.int64),
+            np.ascontiguousarray(pairs[:, 1], dtype=np.int64),
+        )
+
+    def _pair_repulsion(self, i, j):
+        """NumPy repulsion over unordered candidate pairs, applied to both pedestrians of each."""
+        xs, ys, radii = self.xs, self.ys, self.radii
+        count = len(xs)
+        dx = xs[i] - xs[j]
+        dy = ys[i] - ys[j]
+        dist = np.sqrt(dx * dx + dy * dy)
+        np.maximum(dist, 1e-6, out=dist)
+        close = dist < self.cutoff
+        i, j, dx, dy, dist = i[close], j[close], dx[close], dy[close], dist[close]
+
+        # Pedestrians parked below the screen exert no force but still feel it.
+        on_screen = ys <= HEIGHT + radii
+        r_ij = radii[i] + radii[j]
+        mag_i = np.where(on_screen[j], self.ped_A[i] * np.exp((r_ij - dist) / self.ped_B[i]) / dist, 0.0)
+        mag_j = np.where(on_screen[i], self.ped_A[j] * np.exp((r_ij - dist) / self.ped_B[j]) / dist, 0.0)
+        self.ped_fx[:] = (
+            np.bincount(i, weights=mag_i * dx, minlength=count)
+            - np.bincount(j, weights=mag_j * dx, minlength=count)
         )
-        pygame.draw.circle(surface, PEDESTRIAN_COLOR, (int(self.x), int(self.y)), self.radius)
+        self.ped_fy[:] = (
+            np.bincount(i, weights=mag_i * dy, minlength=count)
+            - np.bincount(j, weights=mag_j * dy, minlength=count)
+        )
+
+    def _build_cell_list(self):
+        """Bucket pedestrians into grid cells as a CSR-style (cell_start, cell_items) list."""
+        cell_x = np.clip(self.xs // self.cutoff, 0, self.grid_cols - 1).astype(np.int64)
+        cell_y = np.clip(self.ys // self.cutoff, 0, self.grid_rows - 1).astype(np.int64)
+        cell_ids = cell_y * self.grid_cols + cell_x
+        counts = np.bincount(cell_ids, minlength=self.grid_cols * self.grid_rows)
+        np.cumsum(counts, out=self.cell_start[1:])
+        cell_items = np.argsort(cell_ids, kind="stable")
+        return cell_x, cell_y, cell_items
+
+
+class PedestrianSelection:
+    """Subset of a PedestrianSystem that shares its arrays and cached offsets."""
+
+    def __init__(self, system, indices):
+        self.system = system
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __iter__(self):
+        peds = self.system.pedestrians
+        return (peds[i] for i in self.indices.tolist())
+
+    def offsets_from(self, x, y):
+        dx, dy, dist_sq = self.system.offsets_from(x, y)
+        idx = self.indices
+        return dx[idx], dy[idx], dist_sq[idx]
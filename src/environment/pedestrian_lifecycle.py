@@ -177,8 +177,22 @@ def sample_perimeter_spawn(ped, scenario, rng):
 
 
 def reassign_reached_goals(pedestrians, scenario, nav_grid, rng, scenario_id, goal_dwell_frames, pending_perimeter_respawn, flow_pedestrian_ids, sim_fps):
+    """
+    Start goal dwells, choose next goals and respawn groups for a synced
+    PedestrianSystem.
+
+    Only pedestrians that are dwelling or inside the vectorised near-goal
+    mask can change state here, so just those are visited (in crowd order);
+    the rest of the crowd is never touched in Python.
+    """
     respawned_groups = set()
-    for ped in pedestrians:
+    near_goal = pedestrians.near_goal_mask()
+    candidates = set(np.flatnonzero(near_goal).tolist())
+    candidates.update(pedestrians.indices_of(goal_dwell_frames))
+    crowd = pedestrians.pedestrians
+    for i in sorted(candidates):
+        ped = crowd[i]
+        maybe_reached = bool(near_goal[i])
         pid = id(ped)
         dwell_frames = goal_dwell_frames.get(pid, 0)
         if dwell_frames > 0:
@@ -197,7 +211,7 @@ def reassign_reached_goals(pedestrians, scenario, nav_grid, rng, scenario_id, go
                 goal_dwell_frames[pid] = dwell_frames
             continue
 
-        if ped.has_reached_goal():
+        if maybe_reached and ped.has_reached_goal():
             if ped.group_id is not None and ped.group_id not in respawned_groups:
                 group_members = [member for member in pedestrians if member.group_id == ped.group_id]
                 respawn_family_group_members(group_members, scenario, nav_grid, rng)
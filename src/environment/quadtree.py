@@ -0,0 +1,95 @@
+class Quadtree:
+    """
+    Point-region quadtree over circles, used as a broad phase for
+    "which pedestrians are near this box" queries.
+
+    Items are bucketed by their centre; queries are widened by the largest
+    inserted radius so any circle whose bounding box touches the query box is
+    found. Bounds and query boxes are (left, top, right, bottom) tuples.
+    """
+
+    def __init__(self, bounds, capacity = 4, max_depth = 8):
+        self.bounds = bounds
+        self.capacity = capacity
+        self.max_depth = max_depth
+        self.items = []
+        self.children = None
+        self.max_radius = 0.0
+
+    def insert(self, item_id, x, y, r):
+        if r > self.max_radius:
+            self.max_radius = r
+        self._insert(self, 0, (item_id, x, y, r))
+
+    def query(self, aabb):
+        """Return ids of circles whose bounding boxes intersect *aabb*."""
+        left, top, right, bottom = aabb
+        pad = self.max_radius
+        found = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            for item_id, x, y, r in node.items:
+                if x + r >= left and x - r <= right and y + r >= top and y - r <= bottom:
+                    found.append(item_id)
+            if node.children is None:
+                continue
+            for child in node.children:
+                c_left, c_top, c_right, c_bottom = child.bounds
+                if (
+                    c_right + pad >= left
+                    and c_left - pad <= right
+                    and c_bottom + pad >= top
+                    and c_top - pad <= bottom
+                ):
+                    stack.append(child)
+        return found
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _insert(self, node, depth, item):
+        while True:
+            if node.children is None:
+                if len(node.items) < node.capacity or depth >= node.max_depth:
+                    node.items.append(item)
+                    return
+                self._split(node)
+            child = self._child_for(node, item[1], item[2])
+            if child is None:
+                # Centre lies outside the tree bounds: keep it at this level.
+                node.items.append(item)
+                return
+            node = child
+            depth += 1
+
+    def _split(self, node):
+        left, top, right, bottom = node.bounds
+        mid_x = (left + right) * 0.5
+        mid_y = (top + bottom) * 0.5
+        node.children = [
+            Quadtree(bounds, node.capacity, node.max_depth)
+            for bounds in (
+                (left, top, mid_x, mid_y),
+                (mid_x, top, right, mid_y),
+                (left, mid_y, mid_x, bottom),
+                (mid_x, mid_y, right, bottom),
+            )
+        ]
+        items, node.items = node.items, []
+        for item in items:
+            child = self._child_for(node, item[1], item[2])
+            if child is None:
+                node.items.append(item)
+            else:
+                child.items.append(item)
+
+    @staticmethod
+    def _child_for(node, x, y):
+        left, top, right, bottom = node.bounds
+        if not (left <= x <= right and top <= y <= bottom):
+            return None
+        mid_x = (left + right) * 0.5
+        mid_y = (top + bottom) * 0.5
+        return node.children[(2 if y >= mid_y else 0) + (1 if x >= mid_x else 0)]
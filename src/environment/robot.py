@@ -1,30 +1,38 @@
-from dataclasses import dataclass
-import pygame
+from dataclasses import dataclass, field
 
 from constants import HEIGHT, WIDTH, speed_mps_to_px_per_step
+from environment.obstacle_grid import hitbox_collides
+from environment.sprites import circle_sprite
 
 ROBOT_COLOR = (45, 90, 255)
 
-@dataclass
+@dataclass(slots=True)
 class Robot:
     x: float = 80.0
     y: float =  80.0
     speed: float = speed_mps_to_px_per_step(3.0)
     radius: int = 12
+    # Screen-edge clamp bounds for the robot centre, fixed once the radius is known.
+    _min_x: float = field(init=False, repr=False)
+    _max_x: float = field(init=False, repr=False)
+    _min_y: float = field(init=False, repr=False)
+    _max_y: float = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._min_x = self.radius
+        self._max_x = WIDTH - self.radius
+        self._min_y = self.radius
+        self._max_y = HEIGHT - self.radius
 
     def draw(self, surface):
-        pygame.draw.circle(
-            surface,
-            ROBOT_COLOR,
-            (int(self.x), int(self.y)),
-            self.radius,
-        )
+        r = self.radius
+        return surface.blit(circle_sprite(ROBOT_COLOR, r), (int(self.x) - r, int(self.y) - r))
 
     def move(self, delta):
-        self.x += delta.x
-        self.y += delta.y
-        self.x = max(self.radius, min(WIDTH - self.radius, self.x))
-        self.y = max(self.radius, min(HEIGHT - self.radius, self.y))
+        x = self.x + delta.x
+        y = self.y + delta.y
+        self.x = self._min_x if x < self._min_x else self._max_x if x > self._max_x else x
+        self.y = self._min_y if y < self._min_y else self._max_y if y > self._max_y else y
 
     def move_with_obstacles(self, delta, obstacles):
         old_x, old_y = self.x, self.y
@@ -32,7 +40,11 @@ class Robot:
 
         # Resolve x movement first, then y movement to allow sliding behavior.
         attempted_x = self.x + delta.x
-        clamped_x = max(self.radius, min(WIDTH - self.radius, attempted_x))
+        clamped_x = (
+            self._min_x if attempted_x < self._min_x
+            else self._max_x if attempted_x > self._max_x
+            else attempted_x
+        )
         blocked_x = abs(clamped_x - attempted_x) > 1e-6
         self.x = clamped_x
         if self._collides_any(obstacles):
@@ -42,7 +54,11 @@ class Robot:
             blocked_axes += 1
 
         attempted_y = self.y + delta.y
-        clamped_y = max(self.radius, min(HEIGHT - self.radius, attempted_y))
+        clamped_y = (
+            self._min_y if attempted_y < self._min_y
+            else self._max_y if attempted_y > self._max_y
+            else attempted_y
+        )
         blocked_y = abs(clamped_y - attempted_y) > 1e-6
         self.y = clamped_y
         if self._collides_any(obstacles):
@@ -54,10 +70,4 @@ class Robot:
         return blocked_axes
 
     def _collides_any(self, obstacles):
-        hitbox = pygame.Rect(
-            int(self.x - self.radius),
-            int(self.y - self.radius),
-            self.radius * 2,
-            self.radius * 2,
-        )
-        return any(hitbox.colliderect(obstacle) for obstacle in obstacles)
+        return hitbox_collides(self.x, self.y, self.radius, obstacles)
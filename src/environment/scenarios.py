@@ -1,5 +1,6 @@
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import lru_cache
 import json
 from pathlib import Path
 import pygame
@@ -14,6 +15,7 @@ from environment.behaviors import (
     ClumpBehavior,
     ZigzagBehavior,
 )
+from environment.obstacle_grid import ObstacleGrid, hitbox_collides
 from environment.pedestrian import Pedestrian
 
 
@@ -66,6 +68,8 @@ class Scenario:
     obstacles: list[pygame.Rect]
     pedestrian_spawn_regions: list[pygame.Rect]
     pedestrian_goal_regions: list[pygame.Rect]
+    # Broad-phase index over `obstacles` for local collision queries.
+    obstacle_grid: ObstacleGrid | None = field(default=None, repr=False, compare=False)
 
 
 @dataclass(frozen=True)
@@ -92,13 +96,7 @@ def _tuple4(raw):
 def _point_hits_obstacles(x, y, obstacles, clearance_radius):
     if not obstacles:
         return False
-    hitbox = pygame.Rect(
-        int(x - clearance_radius),
-        int(y - clearance_radius),
-        clearance_radius * 2,
-        clearance_radius * 2,
-    )
-    return any(hitbox.colliderect(obstacle) for obstacle in obstacles)
+    return hitbox_collides(x, y, clearance_radius, obstacles)
 
 
 def _build_behavior(behavior_spec):
@@ -143,6 +141,17 @@ def _build_behavior(behavior_spec):
 
 
 def load_scenario_templates(config_dir = SCENARIO_CONFIG_DIR):
+    """
+    Scenario templates by id. Files are parsed once per config directory;
+    each call gets its own dict over the shared, immutable templates so
+    callers (and pickled/copied envs) never alias the cache.
+    """
+    return dict(_load_scenario_templates(str(Path(config_dir).resolve())))
+
+
+@lru_cache(maxsize=8)
+def _load_scenario_templates(config_dir):
+    config_dir = Path(config_dir)
     templates = {}
     for path in sorted(config_dir.glob("*.json")):
         raw = json.loads(path.read_text(encoding="utf-8"))
@@ -209,20 +218,23 @@ def _sample_extra_obstacles(template, obstacles, rng):
         return out
     count = int(rng.integers(extra_min, extra_max + 1))
     min_size, max_size = template.random_obstacle_size_range
+    integers = rng.integers
+    start, goal = template.robot_start, template.robot_goal
+    # Obstacles inflated once by the 10px spacing, instead of per candidate.
+    blocked = [existing.inflate(20, 20) for existing in out]
     for _ in range(count):
         for _attempt in range(30):
-            w = int(rng.integers(min_size, max_size + 1))
-            h = int(rng.integers(min_size, max_size + 1))
-            x = int(rng.integers(0, max(1, WIDTH - w)))
-            y = int(rng.integers(0, max(1, HEIGHT - h)))
+            w = int(integers(min_size, max_size + 1))
+            h = int(integers(min_size, max_size + 1))
+            x = int(integers(0, max(1, WIDTH - w)))
+            y = int(integers(0, max(1, HEIGHT - h)))
             rect = _rect_to_safe_bounds(x, y, w, h)
-            if _circle_hits_rect(template.robot_start, 45, rect):
+            if _circle_hits_rect(start, 45, rect) or _circle_hits_rect(goal, 45, rect):
                 continue
-            if _circle_hits_rect(template.robot_goal, 45, rect):
-                continue
-            if any(rect.colliderect(existing.inflate(20, 20)) for existing in out):
+            if rect.collidelist(blocked) != -1:
                 continue
             out.append(rect)
+            blocked.append(rect.inflate(20, 20))
             break
     return out
 
@@ -250,6 +262,7 @@ def build_scenario(template, rng, randomize_world = False):
         obstacles=obstacles,
         pedestrian_spawn_regions=[pygame.Rect(*rect) for rect in template.pedestrian_spawn_regions],
         pedestrian_goal_regions=[pygame.Rect(*rect) for rect in template.pedestrian_goal_regions],
+        obstacle_grid=ObstacleGrid(obstacles),
     )
 
 
@@ -372,15 +385,36 @@ def _sample_initial_pedestrian_route(scenario, rng, goal_region_indices = None):
     return spawn, goal
 
 
-def _apply_initial_non_group_profile(ped, scenario_id, rng):
-    lo, hi = _INITIAL_SPEED_SCALE_BY_SCENARIO.get(scenario_id, (0.86, 1.14))
-    speed_scale = float(rng.uniform(lo, hi))
+def _draw_initial_profiles(scenario_id, rng, count):
+    """
+    Draw every pedestrian's initial speed scale, relaxation-time scale,
+    heading jitter and speed fraction in one vectorised call per quantity.
+    """
+    speed_lo, speed_hi = _INITIAL_SPEED_SCALE_BY_SCENARIO.get(scenario_id, (0.86, 1.14))
+    speed_scales = rng.uniform(speed_lo, speed_hi, size=count)
+    relaxation_scales = rng.uniform(0.90, 1.16, size=count)
+    heading_offsets, speed_fractions = _draw_initial_velocity_profiles(scenario_id, rng, count)
+    return speed_scales, relaxation_scales, heading_offsets, speed_fractions
+
+
+def _draw_initial_velocity_profiles(scenario_id, rng, count):
+    """Heading jitter and speed fraction for _seed_initial_velocity, one vectorised call each."""
+    jitter = _INITIAL_HEADING_JITTER_BY_SCENARIO.get(scenario_id, 0.16)
+    fraction_lo, fraction_hi = _INITIAL_SPEED_FRACTION_BY_SCENARIO.get(scenario_id, (0.20, 0.45))
+    return (
+        rng.uniform(-jitter, jitter, size=count),
+        rng.uniform(fraction_lo, fraction_hi, size=count),
+    )
+
+
+def _apply_initial_non_group_profile(ped, speed_scale, relaxation_scale):
+    speed_scale = float(speed_scale)
     ped.desired_speed *= speed_scale
     ped.max_speed = max(ped.desired_speed + 0.4, ped.max_speed * speed_scale)
-    ped.relaxation_time *= float(rng.uniform(0.90, 1.16))
+    ped.relaxation_time *= float(relaxation_scale)
 
 
-def _seed_initial_velocity(ped, scenario_id, rng):
+def _seed_initial_velocity(ped, heading_offset, speed_fraction):
     tx, ty = ped.get_steering_target()
     dx = tx - ped.x
     dy = ty - ped.y
@@ -390,12 +424,8 @@ def _seed_initial_velocity(ped, scenario_id, rng):
         ped.vy = 0.0
         return
 
-    base_heading = float(np.arctan2(dy, dx))
-    jitter = _INITIAL_HEADING_JITTER_BY_SCENARIO.get(scenario_id, 0.16)
-    heading = base_heading + float(rng.uniform(-jitter, jitter))
-    lo, hi = _INITIAL_SPEED_FRACTION_BY_SCENARIO.get(scenario_id, (0.20, 0.45))
-    speed_fraction = float(rng.uniform(lo, hi))
-    speed = ped.desired_speed_step() * speed_fraction
+    heading = float(np.arctan2(dy, dx)) + float(heading_offset)
+    speed = ped.desired_speed_step() * float(speed_fraction)
     ped.vx = float(np.cos(heading) * speed)
     ped.vy = float(np.sin(heading) * speed)
 
@@ -500,6 +530,10 @@ def _generate_family_groups(scenario, template, nav_grid, rng, target_count):
     group_specs, probabilities = normalized
     pedestrians = []
     next_group_id = 0
+    # Group members keep their template speeds; only the initial velocity is jittered.
+    heading_offsets, speed_fractions = _draw_initial_velocity_profiles(
+        scenario.scenario_id, rng, target_count
+    )
 
     while len(pedestrians) < target_count:
         spec_idx = int(rng.choice(len(group_specs), p=probabilities))
@@ -572,7 +606,8 @@ def _generate_family_groups(scenario, template, nav_grid, rng, target_count):
             ped.desired_speed = float(spec.get("desired_speed", ped.desired_speed))
             ped.max_speed = float(spec.get("max_speed", ped.max_speed))
             ped.set_goal(gx, gy, nav_grid=nav_grid, rng=rng)
-            _seed_initial_velocity(ped, scenario.scenario_id, rng)
+            idx = len(pedestrians)
+            _seed_initial_velocity(ped, heading_offsets[idx], speed_fractions[idx])
             pedestrians.append(ped)
 
         next_group_id += 1
@@ -587,6 +622,7 @@ def generate_pedestrian_population(scenario, template, nav_grid, rng, count = 12
     pedestrians = []
     if template.pedestrian_behaviors:
         behavior_counts = _scaled_behavior_counts(template.pedestrian_behaviors, count)
+        profiles = zip(*_draw_initial_profiles(scenario.scenario_id, rng, sum(behavior_counts)))
         for behavior_spec, behavior_count in zip(template.pedestrian_behaviors, behavior_counts):
             for _ in range(behavior_count):
                 behavior, goal_region_indices = _build_behavior(behavior_spec)
@@ -605,13 +641,15 @@ def generate_pedestrian_population(scenario, template, nav_grid, rng, count = 12
                     behavior=behavior,
                     goal_region_indices=goal_region_indices,
                 )
-                _apply_initial_non_group_profile(ped, scenario.scenario_id, rng)
+                speed_scale, relaxation_scale, heading_offset, speed_fraction = next(profiles)
+                _apply_initial_non_group_profile(ped, speed_scale, relaxation_scale)
                 ped.set_goal(gx, gy, nav_grid=nav_grid, rng=rng)
-                _seed_initial_velocity(ped, scenario.scenario_id, rng)
+                _seed_initial_velocity(ped, heading_offset, speed_fraction)
                 pedestrians.append(ped)
         return pedestrians
 
-    for _ in range(count):
+    profiles = _draw_initial_profiles(scenario.scenario_id, rng, count)
+    for speed_scale, relaxation_scale, heading_offset, speed_fraction in zip(*profiles):
         (sx, sy), (gx, gy) = _sample_initial_pedestrian_route(scenario, rng)
         ped = Pedestrian(
             x=sx,
@@ -621,9 +659,9 @@ def generate_pedestrian_population(scenario, template, nav_grid, rng, count = 12
             goal_x=gx,
             goal_y=gy,
         )
-        _apply_initial_non_group_profile(ped, scenario.scenario_id, rng)
+        _apply_initial_non_group_profile(ped, speed_scale, relaxation_scale)
         ped.set_goal(gx, gy, nav_grid=nav_grid, rng=rng)
-        _seed_initial_velocity(ped, scenario.scenario_id, rng)
+        _seed_initial_velocity(ped, heading_offset, speed_fraction)
         pedestrians.append(ped)
     return pedestrians
 
@@ -0,0 +1,18 @@
+from functools import lru_cache
+
+import pygame
+
+
+@lru_cache(maxsize=None)
+def circle_sprite(color, radius):
+    """
+    Colour-keyed surface holding a filled circle, built once per
+    (color, radius). Blitting it at (x - radius, y - radius) gives the same
+    pixels as pygame.draw.circle(surface, color, (x, y), radius).
+    """
+    key = (0, 0, 0) if color == (255, 0, 255) else (255, 0, 255)
+    sprite = pygame.Surface((2 * radius, 2 * radius))
+    sprite.fill(key)
+    sprite.set_colorkey(key)
+    pygame.draw.circle(sprite, color, (radius, radius), radius)
+    return sprite
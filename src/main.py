@@ -1,4 +1,5 @@
 import argparse
+from collections import OrderedDict
 import os
 from pathlib import Path
 import pygame
@@ -6,6 +7,7 @@ import numpy as np
 
 from constants import HEIGHT, WIDTH
 from environment.robot import Robot
+from environment.pedestrian import PedestrianSystem
 from environment.pathfinding import NavGrid
 from environment.scenarios import (
     SCENARIO_CONFIG_DIR,
@@ -29,6 +31,7 @@ SCENARIO_TEXT_COLOR = (70, 70, 70)
 CLOSE_RADIUS = 48
 NEAR_PENALTY = 0.1
 GOAL_RADIUS = 20
+GOAL_RADIUS_SQ = GOAL_RADIUS * GOAL_RADIUS
 OVERLAP_PENALTY_LOW = 0.5
 OVERLAP_PENALTY_MID = 1.0
 OVERLAP_PENALTY_HIGH = 1.5
@@ -43,32 +46,40 @@ CONTROL_MODE_BY_NAME = {
 
 SHOW_RAY_TRACING = True
 
+QUIT_KEYS = (pygame.K_ESCAPE, pygame.K_q)
+SCENARIO_KEYS = {
+    pygame.K_1: "home",
+    pygame.K_2: "airport",
+    pygame.K_3: "shopping_center",
+}
+
 DEFAULT_SCENARIO_ID = "shopping_center"
 DEFAULT_SEED = 42
 
 
-def compute_penalty(robot, pedestrians):
-    frame_penalty = 0.0
+def compute_penalty(robot, ped_system):
+    _, _, dist_sq = ped_system.offsets_from(robot.x, robot.y)
+    overlap_distance = robot.radius + ped_system.radii
 
-    for ped in pedestrians:
-        distance = pygame.Vector2(robot.x - ped.x, robot.y - ped.y).length()
-        overlap_distance = robot.radius + ped.radius
+    overlapping = dist_sq < overlap_distance * overlap_distance
+    near = ~overlapping & (dist_sq < CLOSE_RADIUS * CLOSE_RADIUS)
 
-        if distance < overlap_distance:
-            overlap_ratio = (overlap_distance - distance) / overlap_distance
-            if overlap_ratio < 0.33:
-                frame_penalty += OVERLAP_PENALTY_LOW
-            elif overlap_ratio < 0.66:
-                frame_penalty += OVERLAP_PENALTY_MID
-            else:
-                frame_penalty += OVERLAP_PENALTY_HIGH
-        elif distance < CLOSE_RADIUS:
-            frame_penalty += NEAR_PENALTY
+    overlap_ratio = (
+        overlap_distance[overlapping] - np.sqrt(dist_sq[overlapping])
+    ) / overlap_distance[overlapping]
+    low = int(np.count_nonzero(overlap_ratio < 0.33))
+    mid = int(np.count_nonzero(overlap_ratio < 0.66)) - low
+    high = overlap_ratio.size - low - mid
 
-    return frame_penalty
+    return (
+        low * OVERLAP_PENALTY_LOW
+        + mid * OVERLAP_PENALTY_MID
+        + high * OVERLAP_PENALTY_HIGH
+        + int(np.count_nonzero(near)) * NEAR_PENALTY
+    )
 
 
-def parse_args():
+def parse_args(argv = None):
     parser = argparse.ArgumentParser(description="Crowd navigation simulation")
     parser.add_argument(
         "--scenario",
@@ -107,13 +118,25 @@ def parse_args():
         default=os.getenv("CROWD_SIM_MODE", DEFAULT_MODE),
         help="Robot control mode.",
     )
+    parser.add_argument(
+        "--no-render",
+        action="store_true",
+        default=os.getenv("CROWD_SIM_NO_RENDER", "0") == "1",
+        help="Skip drawing and display updates; the simulation still runs every frame.",
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        default=os.getenv("CROWD_SIM_HEADLESS", "0") == "1",
+        help="Run without a window or frame cap (dummy SDL video driver); implies --no-render.",
+    )
     parser.add_argument(
         "--scenario-config-dir",
         type=str,
         default=os.getenv("CROWD_SIM_SCENARIO_DIR", str(SCENARIO_CONFIG_DIR)),
         help="Path to scenario JSON config directory.",
     )
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 
 def init_rng(seed, random_seed):
@@ -140,17 +163,59 @@ def draw_scenario(screen, scenario):
         pygame.draw.rect(screen, OBSTACLE_COLOR, obstacle, border_radius=4)
 
 
+def render_static_layer(scenario, goal_pos):
+    """Background, obstacles and robot goal for one episode, drawn once into a display-format surface."""
+    layer = pygame.Surface((WIDTH, HEIGHT)).convert()
+    layer.fill(BACKGROUND_COLOR)
+    draw_scenario(layer, scenario)
+    pygame.draw.circle(layer, (245, 130, 40), goal_pos, 16)
+    return layer
+
+
 def build_episode_state(template, rng, pedestrian_count, random_world):
     scenario = build_scenario(template, rng, randomize_world=random_world)
     nav_grid = NavGrid(WIDTH, HEIGHT, scenario.obstacles)
     robot = Robot(x=scenario.robot_start[0], y=scenario.robot_start[1])
     pedestrians = generate_pedestrians(scenario, template, nav_grid, rng, count=pedestrian_count)
+    ped_system = PedestrianSystem(pedestrians)
     goal_pos = pygame.Vector2(*scenario.robot_goal)
-    return scenario, nav_grid, robot, pedestrians, goal_pos
-
-
-def run():
-    args = parse_args()
+    return scenario, nav_grid, robot, pedestrians, ped_system, goal_pos
+
+
+class CachedText:
+    """
+    Font render cache keyed by the label string. Keeps the last *maxsize*
+    surfaces (least recently used are dropped), converted for fast blits.
+    """
+
+    def __init__(self, font, color, maxsize = 1):
+        self.font = font
+        self.color = color
+        self.maxsize = maxsize
+        self.surfaces = OrderedDict()
+
+    def render(self, text):
+        surface = self.surfaces.get(text)
+        if surface is not None:
+            self.surfaces.move_to_end(text)
+            return surface
+        surface = self.font.render(text, True, self.color).convert_alpha()
+        self.surfaces[text] = surface
+        if len(self.surfaces) > self.maxsize:
+            self.surfaces.popitem(last=False)
+        return surface
+
+
+def run(max_frames = None, headless = None, argv = None):
+    """
+    Run the sandbox until the window is closed, or for *max_frames* frames.
+
+    *headless* overrides --headless. *argv* is parsed instead of sys.argv,
+    e.g. run(max_frames=500, headless=True, argv=[]) for a scripted benchmark.
+    """
+    args = parse_args(argv)
+    if headless is not None:
+        args.headless = headless
     control_mode = CONTROL_MODE_BY_NAME[args.mode]
     rng, used_seed = init_rng(seed=args.seed, random_seed=args.random_seed)
     templates = load_scenario_templates(Path(args.scenario_config_dir))
@@ -158,19 +223,32 @@ def run():
     if args.scenario not in templates:
         raise ValueError(f"Unknown scenario '{args.scenario}'. Available: {', '.join(scenario_ids)}")
 
+    if args.headless:
+        # No window: events still need an initialised video system.
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
     if not pygame.display.get_init():
         pygame.display.init()
-    if not pygame.font.get_init():
-        pygame.font.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
-    pygame.display.set_caption("Crowd Navigation Sandbox")
-    clock = pygame.time.Clock()
-    font = pygame.font.Font(None, 32)
-    sub_font = pygame.font.Font(None, 24)
+    render = not (args.headless or args.no_render)
+    if not args.headless:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption("Crowd Navigation Sandbox")
+        font = pygame.font.Font(None, 32)
+        sub_font = pygame.font.Font(None, 24)
+        penalty_text = CachedText(font, HUD_TEXT_COLOR, maxsize=256)
+        scenario_text = CachedText(sub_font, SCENARIO_TEXT_COLOR)
+        seed_label = sub_font.render(
+            f"Seed: {used_seed} | mode={args.mode} | random_world={args.random_world}",
+            True,
+            SCENARIO_TEXT_COLOR,
+        ).convert_alpha()
+    # Headless runs are not paced to real time.
+    clock = None if args.headless else pygame.time.Clock()
 
     current_scenario_id = args.scenario
     current_template = templates[current_scenario_id]
-    scenario, nav_grid, robot, pedestrians, goal_pos = build_episode_state(
+    scenario, nav_grid, robot, pedestrians, ped_system, goal_pos = build_episode_state(
         current_template,
         rng=rng,
         pedestrian_count=args.pedestrians,
@@ -188,34 +266,35 @@ def run():
     total_penalty = 0.0
     episode = 0
     steps = 0
-    total_penalties = []
-    total_steps = []
+    penalty_sum = 0.0
+    step_sum = 0
     goal_dwell_frames = {}
     pending_perimeter_respawn = set()
     flow_pedestrian_ids = select_flow_pedestrians(pedestrians, current_scenario_id, rng)
 
+    behavior_fn = BEHAVIORS[control_mode]
+    # Only manual control reads the keyboard state.
+    reads_keys = control_mode is ControlMode.MANUAL
+    dirty_rects = []
+    full_redraw = True
+    frame = 0
     running = True
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
             elif event.type == pygame.KEYDOWN:
-                if event.key in (pygame.K_ESCAPE, pygame.K_q):
+                if event.key in QUIT_KEYS:
                     running = False
                     continue
-                if event.key == pygame.K_1:
-                    current_scenario_id = "home"
-                elif event.key == pygame.K_2:
-                    current_scenario_id = "airport"
-                elif event.key == pygame.K_3:
-                    current_scenario_id = "shopping_center"
-                else:
+                if event.key not in SCENARIO_KEYS:
                     continue
+                current_scenario_id = SCENARIO_KEYS[event.key]
 
                 if current_scenario_id not in templates:
                     continue
                 current_template = templates[current_scenario_id]
-                scenario, nav_grid, robot, pedestrians, goal_pos = build_episode_state(
+                scenario, nav_grid, robot, pedestrians, ped_system, goal_pos = build_episode_state(
                     current_template,
                     rng=rng,
                     pedestrian_count=args.pedestrians,
@@ -230,30 +309,36 @@ def run():
                 )
                 total_penalty = 0.0
                 steps = 0
+                full_redraw = True
 
         if SHOW_RAY_TRACING:
-            visible_pedestrians = ray_sensor.get_visible_pedestrians(
-                robot.x, robot.y, pedestrians, scenario.obstacles
-            )
+            visible_pedestrians = ped_system.select(ray_sensor.get_visible_pedestrians(
+                robot.x, robot.y,
+                ped_system.nearby(robot.x, robot.y, ray_sensor.max_range),
+                scenario.obstacles,
+            ))
         else:
-            visible_pedestrians = pedestrians
+            visible_pedestrians = ped_system
 
-        keys = pygame.key.get_pressed()
-        move = BEHAVIORS[control_mode](robot, goal_pos, visible_pedestrians, keys)
+        keys = pygame.key.get_pressed() if reads_keys else None
+        move = behavior_fn(robot, goal_pos, visible_pedestrians, keys)
         steps += 1
 
         if move.length_squared() > 0:
             move = move.normalize() * robot.speed
-            robot.move_with_obstacles(move, scenario.obstacles)
-
-        for ped in pedestrians:
-            if goal_dwell_frames.get(id(ped), 0) > 0:
-                ped.vx *= 0.5
-                ped.vy *= 0.5
-                continue
-            ped.update(pedestrians, scenario.obstacles, rng=rng)
+            robot.move_with_obstacles(
+                move,
+                scenario.obstacle_grid.near(robot.x, robot.y, robot.radius + robot.speed + 2),
+            )
+
+        ped_system.step(
+            scenario.obstacles,
+            rng=rng,
+            goal_dwell_frames=goal_dwell_frames,
+            obstacle_grid=scenario.obstacle_grid,
+        )
         reassign_reached_goals(
-            pedestrians,
+            ped_system,
             scenario,
             nav_grid,
             rng=rng,
@@ -263,23 +348,25 @@ def run():
             flow_pedestrian_ids=flow_pedestrian_ids,
             sim_fps=FPS,
         )
+        ped_system.sync()
 
-        total_penalty += compute_penalty(robot, pedestrians)
-        distance_to_goal = pygame.Vector2(robot.x - goal_pos.x, robot.y - goal_pos.y).length()
-        
-        if distance_to_goal < GOAL_RADIUS:
+        total_penalty += compute_penalty(robot, ped_system)
+        goal_dx = robot.x - goal_pos.x
+        goal_dy = robot.y - goal_pos.y
+
+        if goal_dx * goal_dx + goal_dy * goal_dy < GOAL_RADIUS_SQ:
             episode += 1
-            total_penalties.append(total_penalty)
-            total_steps.append(steps)
-            
-            avg_penalty = sum(total_penalties) / len(total_penalties)
-            avg_steps = sum(total_steps) / len(total_steps)
+            penalty_sum += total_penalty
+            step_sum += steps
+
+            avg_penalty = penalty_sum / episode
+            avg_steps = step_sum / episode
             
             print(f"Episode {episode}: penalty={total_penalty:.1f}, steps={steps}")
             print(f"  Averages: penalty={avg_penalty:.1f}, steps={avg_steps:.1f}")
 
             # Reset for next episode
-            scenario, nav_grid, robot, pedestrians, goal_pos = build_episode_state(
+            scenario, nav_grid, robot, pedestrians, ped_system, goal_pos = build_episode_state(
                 current_template,
                 rng=rng,
                 pedestrian_count=args.pedestrians,
@@ -294,38 +381,50 @@ def run():
             )
             total_penalty = 0.0
             steps = 0
+            full_redraw = True
+
+        if render:
+            # Dirty-rect rendering: only areas covered by last frame's moving
+            # actors are restored from the static layer and pushed to the
+            # display. Every episode change forces a full redraw, which is
+            # also when the static layer is rebuilt.
+            if full_redraw:
+                static_layer = render_static_layer(scenario, goal_pos)
+                screen.blit(static_layer, (0, 0))
+            else:
+                for rect in dirty_rects:
+                    screen.blit(static_layer, rect, rect)
+            drawn_rects = [robot.draw(screen)]
+            drawn_rects.extend(ped_system.draw(screen))
+
+            if SHOW_RAY_TRACING:
+                endpoints = ray_sensor.get_ray_endpoints(
+                    robot.x, robot.y,
+                    ped_system.nearby(robot.x, robot.y, ray_sensor.max_range),
+                    scenario.obstacles,
+                )
+                drawn_rects.append(draw_rays(screen, endpoints))
 
-        screen.fill(BACKGROUND_COLOR)
-        draw_scenario(screen, scenario)
-        pygame.draw.circle(screen, (245, 130, 40), goal_pos, 16)
-        robot.draw(screen)
-        for ped in pedestrians:
-            ped.draw(screen)
-
-        if SHOW_RAY_TRACING:
-            endpoints = ray_sensor.get_ray_endpoints(
-                robot.x, robot.y,
-                pedestrians, scenario.obstacles
+            penalty_label = penalty_text.render(f"Penalty: {int(total_penalty)}")
+            drawn_rects.append(screen.blit(penalty_label, (20, 20)))
+            scenario_label = scenario_text.render(
+                f"Scenario: {scenario.name} (1:Home 2:Airport 3:Shopping)"
             )
-            draw_rays(screen, endpoints)
+            drawn_rects.append(screen.blit(scenario_label, (20, 52)))
+            drawn_rects.append(screen.blit(seed_label, (20, 76)))
 
-        penalty_label = font.render(f"Penalty: {total_penalty:.1f}", True, HUD_TEXT_COLOR)
-        screen.blit(penalty_label, (20, 20))
-        scenario_label = sub_font.render(
-            f"Scenario: {scenario.name} (1:Home 2:Airport 3:Shopping)",
-            True,
-            SCENARIO_TEXT_COLOR,
-        )
-        screen.blit(scenario_label, (20, 52))
-        seed_label = sub_font.render(
-            f"Seed: {used_seed} | mode={args.mode} | random_world={args.random_world}",
-            True,
-            SCENARIO_TEXT_COLOR,
-        )
-        screen.blit(seed_label, (20, 76))
-
-        pygame.display.flip()
-        clock.tick(FPS)
+            if full_redraw:
+                pygame.display.flip()
+                full_redraw = False
+            else:
+                pygame.display.update(dirty_rects + drawn_rects)
+            dirty_rects = drawn_rects
+
+        if clock is not None:
+            clock.tick(FPS)
+        frame += 1
+        if max_frames is not None and frame >= max_frames:
+            running = False
 
     pygame.quit()
 